@@ -0,0 +1,119 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+
+from main.models import Sponsor, Student, StudentSponsor
+
+
+# Periods are local calendar days, ISO weeks (starting on Monday) and calendar months. A period that ended before
+# the current one can only change when one of its rows is updated or deleted, so its totals are cached and dropped
+# by forget_period() from the receivers in admin_dashboard.signals. That only reaches the other workers through a
+# shared cache, so they are kept for good with Redis and for ANALYTICS_CACHE_TIMEOUT seconds otherwise.
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+DEFAULT_PERIODS = {'day': 30, 'week': 12, 'month': 12}
+MAX_PERIODS = 400
+CACHE_PREFIX = 'analytics:v1'
+EMPTY_PERIOD = {
+    'sponsor_count': 0,
+    'student_count': 0,
+    'allocation_count': 0,
+    'allocated_money': 0,
+}
+
+
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def period_starts(start_date, end_date, granularity):
+    start = period_start(start_date, granularity)
+    while start <= end_date:
+        yield start
+        start = next_period(start, granularity)
+
+
+def default_start_date(end_date, granularity):
+    start = period_start(end_date, granularity)
+    for _ in range(DEFAULT_PERIODS[granularity] - 1):
+        start = period_start(start - timedelta(days=1), granularity)
+    return start
+
+
+def cache_key(granularity, start):
+    return f'{CACHE_PREFIX}:{granularity}:{start.isoformat()}'
+
+
+def start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def compute_periods(granularity, first_start, end):
+    """Group sponsors, students and allocations created in [first_start, end) by period, one query per table."""
+    trunc = GRANULARITIES[granularity]
+    created_between = {'created_at__gte': start_of(first_start), 'created_at__lt': start_of(end)}
+    periods = {}
+
+    def grouped(queryset, **aggregates):
+        rows = (queryset.filter(**created_between)
+                .annotate(period=trunc('created_at'))
+                .values('period')
+                .annotate(**aggregates)
+                .order_by())
+        for row in rows:
+            period = periods.setdefault(timezone.localtime(row.pop('period')).date(), dict(EMPTY_PERIOD))
+            period.update({name: value or 0 for name, value in row.items()})
+
+    grouped(Sponsor.objects, sponsor_count=Count('id'))
+    grouped(Student.objects, student_count=Count('id'))
+    grouped(StudentSponsor.objects, allocation_count=Count('id'), allocated_money=Sum('allocated_money'))
+    return periods
+
+
+def time_series(start_date, end_date, granularity):
+    """
+    Totals per period for every period overlapping [start_date, end_date]. Closed periods come from the cache
+    when present; the open period (and anything after it) is always recomputed.
+    """
+    starts = list(period_starts(start_date, end_date, granularity))
+    open_start = period_start(timezone.localdate(), granularity)
+
+    periods = cache.get_many([cache_key(granularity, start) for start in starts if start < open_start])
+    periods = {start: periods[cache_key(granularity, start)]
+               for start in starts if cache_key(granularity, start) in periods}
+
+    missing = [start for start in starts if start not in periods]
+    if missing:
+        computed = compute_periods(granularity, missing[0], next_period(missing[-1], granularity))
+        for start in missing:
+            periods[start] = computed.get(start, EMPTY_PERIOD)
+        cache.set_many({cache_key(granularity, start): periods[start]
+                        for start in missing if start < open_start}, timeout=settings.ANALYTICS_CACHE_TIMEOUT)
+
+    return [{'period': start.isoformat(), **periods[start]} for start in starts]
+
+
+def forget_period(created_at):
+    """Drop the cached totals of every period containing created_at."""
+    day = timezone.localtime(created_at).date()
+    cache.delete_many([cache_key(granularity, period_start(day, granularity)) for granularity in GRANULARITIES])
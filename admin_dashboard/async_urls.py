@@ -0,0 +1,11 @@
+from django.urls import path
+from . import async_views
+
+
+urlpatterns = [
+    path('sponsors/', async_views.sponsor_list, name='async_sponsor_list'),
+    path('sponsors/<uuid:id>', async_views.sponsor_detail, name='async_sponsor_detail'),
+    path('students/', async_views.student_list, name='async_student_list'),
+    path('students/<uuid:id>/', async_views.student_detail, name='async_student_detail'),
+    path('summary/', async_views.summary, name='async_summary'),
+]
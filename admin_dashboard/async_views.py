@@ -0,0 +1,77 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from main.models import Sponsor, Student
+from shared.async_views import staff_required
+from shared.custom_pagination import CustomPagination
+from shared.routers import reads_from_replica
+from .filters import filter_sponsors, filter_students
+from .models import DashboardSummary
+from .serializers import SponsorSerializer, StudentSerializer
+
+
+# Async versions of the read endpoints, served under admin-dashboard/async/ when running on ASGI (Procfile.asgi).
+# They return the same JSON as the DRF views, with page number pagination only.
+
+
+def error_response(exc):
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    return JsonResponse(detail, status=exc.status_code, safe=False)
+
+
+async def paginated_response(request, queryset, filter_queryset, serializer_class):
+    request = Request(request)  # For query_params and the pagination links
+    paginator = CustomPagination()
+    try:
+        page = await paginator.apaginate_queryset(filter_queryset(queryset, request.query_params), request)
+    except APIException as exc:
+        return error_response(exc)
+    data = serializer_class(page, many=True).data
+    return JsonResponse(paginator.get_paginated_response(data).data)
+
+
+async def detail_response(queryset, id, serializer_class):
+    instance = await queryset.filter(id=id).afirst()
+    if instance is None:
+        return JsonResponse({'detail': f'No {queryset.model._meta.object_name} matches the given query.'}, status=404)
+    return JsonResponse(serializer_class(instance).data)
+
+
+@reads_from_replica
+@require_GET
+@staff_required
+async def sponsor_list(request):
+    sponsors = Sponsor.objects.with_funds().order_by('-created_at', '-id')
+    return await paginated_response(request, sponsors, filter_sponsors, SponsorSerializer)
+
+
+@reads_from_replica
+@require_GET
+@staff_required
+async def sponsor_detail(request, id):
+    return await detail_response(Sponsor.objects.with_funds(), id, SponsorSerializer)
+
+
+@reads_from_replica
+@require_GET
+@staff_required
+async def student_list(request):
+    students = Student.objects.with_funding().order_by('-created_at', '-id')
+    return await paginated_response(request, students, filter_students, StudentSerializer)
+
+
+@reads_from_replica
+@require_GET
+@staff_required
+async def student_detail(request, id):
+    return await detail_response(Student.objects.with_funding(), id, StudentSerializer)
+
+
+@reads_from_replica
+@require_GET
+@staff_required
+async def summary(request):
+    summary = await DashboardSummary.aload()
+    return JsonResponse(summary.to_dict())
@@ -0,0 +1,108 @@
+import math
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from shared.search import fuzzy_search
+
+
+# Filters compare a raw column with a constant (no casts), so the b-tree indexes on (status, created_at),
+# (status, total_sponsorship_amount), (degree, created_at) and (created_at, id) apply. The one exception is
+# university__iexact, which compiles to UPPER(university) = UPPER(%s) and is served by the expression index
+# students_university_upper_idx; a plain index on university would not be used.
+
+
+def parse_date(date_string, param_name):
+    """Parse a DD-MM-YYYY query parameter into a date."""
+    try:
+        return datetime.strptime(date_string, '%d-%m-%Y').date()
+    except ValueError:
+        raise ValidationError({param_name: "Invalid date format"})
+
+
+def parse_number(value, param_name, label):
+    """Parse a numeric query parameter into a finite float; float() also accepts "nan" and "inf"."""
+    try:
+        number = float(value)
+    except ValueError:
+        number = math.nan
+    if not math.isfinite(number):
+        raise ValidationError({param_name: f'{label} must be a valid number.'})
+    return number
+
+
+def start_of_day(date_string, param_name):
+    """Parse DD-MM-YYYY into an aware datetime at midnight of that day in the current time zone."""
+    return timezone.make_aware(datetime.combine(parse_date(date_string, param_name), time.min))
+
+
+def filter_sponsors(queryset, query_params):
+    # Searching
+    search = query_params.get('search', '')
+    # Filtering
+    application_status = query_params.get('status', None)
+    total_sponsorship_amount = query_params.get('amount', None)  # This searches for what is greater than the amount
+    start_date = query_params.get('start_date', None)
+    end_date = query_params.get('end_date', None)
+
+    filters = Q()
+
+    if application_status:
+        if application_status not in ['new', 'in_progress', 'verified', 'cancelled']:
+            raise ValidationError({'status': 'Invalid status.'})
+        filters &= Q(status=application_status)
+
+    if total_sponsorship_amount:
+        try:
+            total_sponsorship_amount = int(total_sponsorship_amount)
+            filters &= Q(total_sponsorship_amount__gte=total_sponsorship_amount)
+        except ValueError:
+            raise ValidationError({'amount': 'Amount must be a valid integer.'})
+
+    if start_date:
+        filters &= Q(created_at__gte=start_of_day(start_date, 'start_date'))
+
+    if end_date:
+        # end_date is inclusive, so everything before the next midnight
+        filters &= Q(created_at__lt=start_of_day(end_date, 'end_date') + timedelta(days=1))
+
+    return fuzzy_search(queryset.filter(filters), search, ['full_name', 'company_name'])
+
+
+def filter_students(queryset, query_params):
+    """Filter a Student.objects.with_funding() queryset."""
+    # Searching
+    search = query_params.get('search', '')
+    # Filtering
+    degree = query_params.get('degree', None)
+    university = query_params.get('university', None)
+    funding = query_params.get('funding', None)
+    min_remaining = query_params.get('min_remaining', None)
+    max_remaining = query_params.get('max_remaining', None)
+
+    filters = Q()
+
+    if degree:
+        if degree not in ['bachelor', 'master']:
+            raise ValidationError({'degree': 'Invalid degree. Degree must be one of them ("bachelor", "master")'})
+        filters &= Q(degree=degree)
+
+    if university:
+        filters &= Q(university__iexact=university)
+
+    if min_remaining:
+        filters &= Q(remaining_tuition_fee__gte=parse_number(min_remaining, 'min_remaining', 'Minimum remaining'))
+
+    if max_remaining:
+        filters &= Q(remaining_tuition_fee__lte=parse_number(max_remaining, 'max_remaining', 'Maximum remaining'))
+
+    students = queryset.filter(filters)
+
+    if funding:
+        if funding not in ['unfunded', 'partial', 'full']:
+            raise ValidationError({'funding': 'Invalid funding. Funding must be one of them ("unfunded", "partial", "full")'})
+        students = students.funding(funding)
+
+    return fuzzy_search(students, search, ['full_name', 'university'])
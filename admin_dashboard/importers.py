@@ -0,0 +1,82 @@
+import csv
+import json
+import os
+
+from django.db import transaction
+
+from main.models import Student
+from .models import DashboardSummary
+from .serializers import StudentSerializer
+
+
+CSV, JSONL = 'csv', 'jsonl'
+IMPORT_FORMATS = (CSV, JSONL)
+
+
+def detect_format(file_name, file_format=None):
+    file_format = file_format or os.path.splitext(file_name or '')[1].lstrip('.').lower()
+    if file_format == 'json':
+        file_format = JSONL
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError('File format must be one of them ("csv", "jsonl").')
+    return file_format
+
+
+def read_rows(lines, file_format):
+    """
+    Lazily yield (row_number, row) pairs from an iterable of text lines, so the file is never held in memory.
+    A row that can not be parsed is yielded as (row_number, None).
+    """
+    if file_format == CSV:
+        reader = csv.DictReader(lines)
+        for row_number, row in enumerate(reader, start=2):  # Row 1 is the header
+            yield row_number, row
+        return
+
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row_number, row if isinstance(row, dict) else None
+
+
+def import_students(rows, chunk_size=1000, max_errors=1000):
+    """
+    Validate every row with StudentSerializer and insert the valid ones with bulk_create,
+    one transaction per chunk of chunk_size students. Only the first max_errors errors are kept.
+    """
+    report = {'created': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    chunk = []
+
+    def flush():
+        with transaction.atomic():
+            Student.objects.bulk_create(chunk)
+            DashboardSummary.record(student_count=len(chunk),
+                                    total_asked_amount=sum(student.tuition_fee for student in chunk))
+        report['created'] += len(chunk)
+        chunk.clear()
+
+    for row_number, row in rows:
+        if row is None:
+            errors = {'non_field_errors': ['Row could not be parsed.']}
+        else:
+            serializer = StudentSerializer(data=row)
+            if serializer.is_valid():
+                chunk.append(Student(**serializer.validated_data))
+                if len(chunk) >= chunk_size:
+                    flush()
+                continue
+            errors = serializer.errors
+
+        report['failed'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'row': row_number, 'errors': errors})
+        else:
+            report['errors_truncated'] = True
+
+    if chunk:
+        flush()
+    return report
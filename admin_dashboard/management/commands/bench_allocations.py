@@ -0,0 +1,88 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+
+from admin_dashboard.services import allocate
+from main.models import Sponsor, Student, StudentSponsor, INDIVIDUAL, CASH, VERIFIED, BACHELOR
+from shared.benchmark import run_concurrently
+from shared.utils import MONEY_TOLERANCE
+
+
+BENCH_PREFIX = 'bench-allocations'
+
+
+class Command(BaseCommand):
+    help = ('Hammer the allocation service from many threads against a few hot sponsors and students, '
+            'report allocations per second and verify nothing was over-allocated. Needs PostgreSQL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--allocations', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--sponsors', type=int, default=5)
+        parser.add_argument('--students', type=int, default=50)
+        parser.add_argument('--amount', type=float, default=50000, help='Money moved by every allocation.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated rows after the run.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                f'{connection.vendor} has no row locks; the run only shows single-writer behaviour.'))
+
+        rng = random.Random(options['seed'])
+        sponsors = [
+            Sponsor.objects.create(
+                sponsor_type=INDIVIDUAL, full_name=f'{BENCH_PREFIX}-sponsor-{i}', phone_number='+998000000000',
+                payment_type=CASH, total_sponsorship_amount=1000000, status=VERIFIED
+            ) for i in range(options['sponsors'])
+        ]
+        students = [
+            Student.objects.create(
+                full_name=f'{BENCH_PREFIX}-student-{i}', phone_number='+998000000000', university=BENCH_PREFIX,
+                degree=BACHELOR, tuition_fee=2000000
+            ) for i in range(options['students'])
+        ]
+        pairs = [(rng.choice(students).id, rng.choice(sponsors).id) for _ in range(options['allocations'])]
+
+        def task(i):
+            student_id, sponsor_id = pairs[i]
+            try:
+                allocate(student_id, sponsor_id, options['amount'])
+            except ValidationError:
+                return 'rejected'
+            return 'allocated'
+
+        try:
+            result = run_concurrently(task, options['allocations'], options['concurrency'])
+            violations = self.check_invariants(sponsors, students)
+        finally:
+            if not options['keep']:
+                Sponsor.objects.filter(full_name__startswith=BENCH_PREFIX).delete()
+                Student.objects.filter(full_name__startswith=BENCH_PREFIX).delete()
+
+        summary = result.summary()
+        summary['allocations_per_s'] = round(result.outcomes['allocated'] / result.elapsed, 2)
+        summary['violations'] = violations
+        self.stdout.write(json.dumps(summary, indent=2))
+
+        if violations:
+            raise CommandError(f'{len(violations)} invariant violation(s) found.')
+        self.stdout.write(self.style.SUCCESS('No over-allocation.'))
+
+    @staticmethod
+    def check_invariants(sponsors, students):
+        violations = []
+        for model, field_name, limit_field, rows in ((Sponsor, 'sponsor', 'total_sponsorship_amount', sponsors),
+                                                     (Student, 'student', 'tuition_fee', students)):
+            for row in model.objects.filter(id__in=[row.id for row in rows]):
+                actual = StudentSponsor.objects.filter(**{field_name: row}).aggregate(
+                    total=Sum('allocated_money'))['total'] or 0
+                if actual > getattr(row, limit_field):
+                    violations.append(f'{row} over-allocated: {actual} > {getattr(row, limit_field)}')
+                if abs(actual - row.allocated_total) > MONEY_TOLERANCE:
+                    violations.append(f'{row} allocated_total {row.allocated_total} != {actual}')
+        return violations
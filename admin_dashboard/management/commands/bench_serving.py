@@ -0,0 +1,103 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shared.benchmark import add_username_argument, run_concurrently, staff_auth_headers
+
+
+ENDPOINTS = ('sponsors/', 'students/', 'summary/')
+
+SERVERS = {
+    # Same commands as Procfile and Procfile.asgi, bound to a local port.
+    'wsgi': ['gunicorn', 'metsenat.wsgi:application'],
+    'asgi': ['gunicorn', 'metsenat.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+PREFIXES = {
+    'wsgi': '/admin-dashboard/',  # DRF views
+    'asgi': '/admin-dashboard/async/',  # admin_dashboard.async_views
+}
+
+
+class Command(BaseCommand):
+    help = ('Compare throughput and latency percentiles of the sync DRF read endpoints on gunicorn (WSGI) '
+            'with their async versions on gunicorn + uvicorn workers (ASGI) under concurrent load.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and server.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--workers', type=int, default=3, help='Worker processes of each server.')
+        parser.add_argument('--endpoints', nargs='+', default=ENDPOINTS)
+        add_username_argument(parser)
+        parser.add_argument('--wsgi-url', help='Base URL of an already running WSGI server instead of starting one.')
+        parser.add_argument('--asgi-url', help='Base URL of an already running ASGI server instead of starting one.')
+        parser.add_argument('--output', help='Also write the JSON results to this file.')
+
+    def handle(self, *args, **options):
+        headers = staff_auth_headers(options['username'])
+
+        results = {}
+        for kind in SERVERS:
+            base_url, server = options[f'{kind}_url'], None
+            if not base_url:
+                base_url, server = self.start_server(kind, options['workers'])
+            try:
+                for endpoint in options['endpoints']:
+                    url = base_url.rstrip('/') + PREFIXES[kind] + endpoint
+                    self.request(url, headers)  # Warm up
+                    result = run_concurrently(lambda i: self.request(url, headers),
+                                              options['requests'], options['concurrency'])
+                    results.setdefault(endpoint, {})[kind] = result.summary()
+            finally:
+                if server:
+                    server.terminate()
+                    server.wait()
+
+        for endpoint, by_kind in results.items():
+            wsgi, asgi = by_kind['wsgi'], by_kind['asgi']
+            by_kind['asgi_vs_wsgi'] = {
+                'throughput': round(asgi['throughput_per_s'] / wsgi['throughput_per_s'], 2)
+                if wsgi['throughput_per_s'] else None,
+                'p99': round(asgi['p99_ms'] / wsgi['p99_ms'], 2) if wsgi['p99_ms'] else None,
+            }
+
+        output = json.dumps(results, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+
+    @staticmethod
+    def request(url, headers):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def start_server(self, kind, workers):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        command = [sys.executable, '-m', *SERVERS[kind], '--workers', str(workers), '--bind', f'127.0.0.1:{port}']
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=os.environ.copy())
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'{kind} server exited with {server.returncode}: {" ".join(command)}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return f'http://127.0.0.1:{port}', server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'{kind} server did not start listening on port {port}.')
@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_dashboard.importers import detect_format, read_rows, import_students, IMPORT_FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Stream students from a CSV or JSONL file into the database in bulk_create chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Taken from the file extension if omitted.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--max-errors', type=int, default=1000, help='Row errors to keep in the report.')
+
+    def handle(self, *args, **options):
+        try:
+            file_format = detect_format(options['path'], options['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+            report = import_students(
+                read_rows(lines, file_format),
+                chunk_size=options['chunk_size'],
+                max_errors=options['max_errors']
+            )
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        if report['errors_truncated']:
+            self.stderr.write('... more errors were not kept')
+
+        self.stdout.write(self.style.SUCCESS(f"Created {report['created']} student(s), {report['failed']} row(s) failed."))
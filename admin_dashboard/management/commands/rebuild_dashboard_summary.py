@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_dashboard.models import DashboardSummary
+from shared.utils import MONEY_TOLERANCE
+
+
+class Command(BaseCommand):
+    help = 'Check the incrementally maintained dashboard summary against the source tables and rebuild it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drifted totals; exit with an error if any drifted.'
+        )
+
+    def handle(self, *args, **options):
+        stored = DashboardSummary.objects.filter(pk=1).first()
+        live = DashboardSummary.live_totals()
+
+        drifted = []
+        for field, value in live.items():
+            stored_value = getattr(stored, field) if stored else None
+            if stored_value is None or abs(stored_value - value) > MONEY_TOLERANCE:
+                drifted.append(field)
+                self.stdout.write(f'{field}: stored {stored_value}, actual {value}')
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f'{len(drifted)} summary total(s) drifted.')
+            self.stdout.write(self.style.SUCCESS('Dashboard summary is in sync.'))
+            return
+
+        DashboardSummary.rebuild()
+        self.stdout.write(self.style.SUCCESS('Dashboard summary rebuilt.'))
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2025-03-08 11:05
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def create_summary(apps, schema_editor):
+    Student = apps.get_model('main', 'Student')
+    Sponsor = apps.get_model('main', 'Sponsor')
+    StudentSponsor = apps.get_model('main', 'StudentSponsor')
+    DashboardSummary = apps.get_model('admin_dashboard', 'DashboardSummary')
+    DashboardSummary.objects.create(
+        pk=1,
+        student_count=Student.objects.count(),
+        sponsor_count=Sponsor.objects.count(),
+        total_paid_amount=StudentSponsor.objects.aggregate(total=Sum('allocated_money'))['total'] or 0,
+        total_asked_amount=Student.objects.aggregate(total=Sum('tuition_fee'))['total'] or 0,
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('main', '0003_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.IntegerField(default=0)),
+                ('sponsor_count', models.IntegerField(default=0)),
+                ('total_paid_amount', models.FloatField(default=0)),
+                ('total_asked_amount', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Dashboard summary',
+                'verbose_name_plural': 'Dashboard summary',
+                'db_table': 'dashboard_summary',
+            },
+        ),
+        migrations.RunPython(create_summary, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,80 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
 
-# Create your models here.
+from main.models import Student, Sponsor, StudentSponsor
+from shared.async_views import gather_queries
+
+
+class DashboardSummary(models.Model):
+    """
+    Single row holding the totals behind StudentSponsorSummaryAPIView. It is moved incrementally by the
+    receivers in admin_dashboard.signals and by the bulk write paths, and can be rebuilt from the source tables.
+    """
+    student_count = models.IntegerField(default=0)
+    sponsor_count = models.IntegerField(default=0)
+    total_paid_amount = models.FloatField(default=0)
+    total_asked_amount = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dashboard_summary'
+        verbose_name = 'Dashboard summary'
+        verbose_name_plural = 'Dashboard summary'
+
+    @staticmethod
+    def live_total_queries():
+        """The independent queries behind every total, as callables."""
+        return {
+            'student_count': Student.objects.count,
+            'sponsor_count': Sponsor.objects.count,
+            'total_paid_amount': lambda: StudentSponsor.objects.aggregate(total=Sum('allocated_money'))['total'] or 0,
+            'total_asked_amount': lambda: Student.objects.aggregate(total=Sum('tuition_fee'))['total'] or 0,
+        }
+
+    @classmethod
+    def live_totals(cls):
+        return {field: query() for field, query in cls.live_total_queries().items()}
+
+    @classmethod
+    def load(cls):
+        summary = cls.objects.filter(pk=1).first()
+        if summary is None:
+            summary = cls.rebuild()
+        return summary
+
+    @classmethod
+    async def aload(cls):
+        summary = await cls.objects.filter(pk=1).afirst()
+        if summary is None:
+            # Only when the row is missing: compute the totals side by side instead of one after another.
+            queries = cls.live_total_queries()
+            totals = await gather_queries(*queries.values())
+            summary, _ = await cls.objects.aupdate_or_create(pk=1, defaults=dict(zip(queries, totals)))
+        return summary
+
+    @classmethod
+    def rebuild(cls):
+        summary, _ = cls.objects.update_or_create(pk=1, defaults=cls.live_totals())
+        return summary
+
+    @classmethod
+    def record(cls, **deltas):
+        """
+        Add deltas to the summary once the current transaction commits. Applying them after the commit keeps the
+        lock on this hot row as short as possible and out of the allocation lock order.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        changes = {field: F(field) + delta for field, delta in deltas.items()}
+        transaction.on_commit(lambda: cls.objects.filter(pk=1).update(updated_at=timezone.now(), **changes))
+
+    def to_dict(self):
+        return {
+            'student_count': self.student_count,
+            'sponsor_count': self.sponsor_count,
+            'total_paid_amount': self.total_paid_amount,
+            'total_asked_amount': self.total_asked_amount,
+            'remaining_unpaid_amount': self.total_asked_amount - self.total_paid_amount
+        }
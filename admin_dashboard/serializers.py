@@ -2,12 +2,15 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from main.models import Student, Sponsor, StudentSponsor, INDIVIDUAL, LEGAL_ENTITY
-from django.db.models import Sum
+from shared.serializers import TimedSerializerMixin
+from shared.utils import normalize_phone_number
 
 
-class SponsorSerializer(serializers.ModelSerializer):
+class SponsorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
+    phone_number = serializers.CharField(max_length=32)  # Normalized like sponsor applications
     money_spent = serializers.SerializerMethodField()
+    available_funds = serializers.SerializerMethodField()
 
     class Meta:
         model = Sponsor
@@ -17,6 +20,7 @@ class SponsorSerializer(serializers.ModelSerializer):
             'phone_number',
             'total_sponsorship_amount',
             'money_spent',
+            'available_funds',
             'created_at',
             'updated_at',
             'status',
@@ -27,14 +31,26 @@ class SponsorSerializer(serializers.ModelSerializer):
 
 
     def get_money_spent(self, obj):
-        result = StudentSponsor.objects.filter(sponsor=obj).aggregate(total=Sum('allocated_money'))
-        return result['total'] or 0
+        return getattr(obj, 'money_spent', obj.allocated_total)  # Annotated by Sponsor.objects.with_funds()
 
+    def get_available_funds(self, obj):
+        available_funds = getattr(obj, 'available_funds', None)
+        if available_funds is None:
+            available_funds = obj.total_sponsorship_amount - self.get_money_spent(obj)
+        return available_funds
+
+
+    def validate_phone_number(self, value):
+        phone_number = normalize_phone_number(value)
+        if phone_number is None:
+            raise ValidationError('Enter a valid phone number, e.g. +998901234567.')
+        return phone_number
 
     def validate(self, attrs):
         instance = getattr(self, 'instance', None)  # when updating a sponsor, it attaches instance to it.
-        company_name = attrs.get('company_name')
-        sponsor_type = attrs.get('sponsor_type')
+        # Partial updates are checked against the stored values of the fields they leave out.
+        company_name = attrs.get('company_name', instance.company_name if instance else None)
+        sponsor_type = attrs.get('sponsor_type', instance.sponsor_type if instance else None)
 
         if sponsor_type == LEGAL_ENTITY and not company_name:
             raise ValidationError(
@@ -45,6 +61,7 @@ class SponsorSerializer(serializers.ModelSerializer):
             )
 
         if instance and instance.sponsor_type == LEGAL_ENTITY and sponsor_type == INDIVIDUAL:
+            company_name = attrs.get('company_name')  # Only a company name sent along with the change is an error
             attrs['company_name'] = None  # Clear company name field when changing from legal entity to individual
 
         if sponsor_type == INDIVIDUAL and company_name:
@@ -57,21 +74,34 @@ class SponsorSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(validate=False)  # Field validators run in the serializer fields, Sponsor.clean() in validate()
+        return instance
+
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     covered_tuition_fee = serializers.SerializerMethodField()
+    remaining_tuition_fee = serializers.SerializerMethodField()
 
     class Meta:
         model = Student
-        fields = ['id', 'full_name', 'phone_number', 'university', 'degree', 'tuition_fee', 'covered_tuition_fee', 'created_at', 'updated_at']
+        fields = ['id', 'full_name', 'phone_number', 'university', 'degree', 'tuition_fee', 'covered_tuition_fee',
+                  'remaining_tuition_fee', 'created_at', 'updated_at']
 
     def get_covered_tuition_fee(self, obj):
-        result = StudentSponsor.objects.filter(student=obj).aggregate(total=Sum('allocated_money'))
-        return result['total'] or 0
+        return getattr(obj, 'covered_tuition_fee', obj.allocated_total)  # Annotated by Student.objects.with_funding()
 
+    def get_remaining_tuition_fee(self, obj):
+        remaining_tuition_fee = getattr(obj, 'remaining_tuition_fee', None)
+        if remaining_tuition_fee is None:
+            remaining_tuition_fee = obj.tuition_fee - self.get_covered_tuition_fee(obj)
+        return remaining_tuition_fee
 
-class StudentSponsorSerializer(serializers.ModelSerializer):
+
+class StudentSponsorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     sponsor = SponsorSerializer(read_only=True)
     sponsor_id = serializers.UUIDField(write_only=True)
@@ -79,19 +109,27 @@ class StudentSponsorSerializer(serializers.ModelSerializer):
     class Meta:
         model = StudentSponsor
         fields = ['id', 'sponsor', 'sponsor_id', 'allocated_money']
+        # Whether the sponsor exists and can afford the allocation is checked by services.allocate() under lock.
 
 
-    def validate(self, attrs):
-        sponsor_id = attrs.get('sponsor_id')
 
-        if sponsor_id:
-            if not Sponsor.objects.filter(id=sponsor_id).exists():
-                raise ValidationError(
-                    {
-                        'success': False,
-                        'message': 'There is no sponsor found with this id.'
-                    }
-                )
+class StudentSponsorBatchItemSerializer(serializers.Serializer):
+    student_id = serializers.UUIDField()
+    sponsor_id = serializers.UUIDField()
+    allocated_money = serializers.FloatField()
+
+    def validate_allocated_money(self, value):
+        # StudentSponsor.allocation_error() only checks the upper limits; a negative amount would add funds.
+        if value <= 0:
+            raise ValidationError('Allocated money must be greater than zero.')
+        return value
+
+
+class StudentSponsorBatchSerializer(serializers.Serializer):
+    atomic = serializers.BooleanField(default=True)  # All-or-nothing unless explicitly turned off
+    items = StudentSponsorBatchItemSerializer(many=True, allow_empty=False, max_length=1000)
 
-        return attrs
 
+class StudentImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)  # Taken from the file name if omitted
@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from main.models import Sponsor, Student, StudentSponsor
+from .models import DashboardSummary
+
+
+def lock_rows(sponsor_ids, student_ids):
+    """
+    Lock the given sponsor and student rows for the rest of the transaction.
+    Sponsors are always locked before students and both in primary key order, which is the same order
+    StudentSponsor.save() updates them in, so concurrent allocations queue up instead of deadlocking.
+    """
+    sponsors = {sponsor.id: sponsor for sponsor in
+                Sponsor.objects.select_for_update().filter(id__in=sponsor_ids).order_by('id')}
+    students = {student.id: student for student in
+                Student.objects.select_for_update().filter(id__in=student_ids).order_by('id')}
+    return sponsors, students
+
+
+def allocate(student_id, sponsor_id, allocated_money, allocation=None):
+    """
+    Create a StudentSponsor, or change an existing one when allocation is given, with the affected sponsor
+    and student rows locked so the remaining funds checks in StudentSponsor.clean() can not race.
+    This is the only validation of the allocation on the API path: both rows were just fetched under lock, so
+    the full_clean() of a plain save() would only re-check that they exist.
+    """
+    with transaction.atomic():
+        sponsor_ids, student_ids = {sponsor_id}, {student_id}
+
+        if allocation is None:
+            allocation = StudentSponsor()
+        else:
+            # Lock the allocation itself first and re-read it; what it used to hold has to be released.
+            allocation = StudentSponsor.objects.select_for_update().get(id=allocation.id)
+            sponsor_ids.add(allocation.sponsor_id)
+            student_ids.add(allocation.student_id)
+
+        sponsors, students = lock_rows(sponsor_ids, student_ids)
+
+        if student_id not in students:
+            raise Http404('Student with this id does not exist.')
+        if sponsor_id not in sponsors:
+            raise ValidationError(
+                {
+                    'success': False,
+                    'message': 'There is no sponsor found with this id.'
+                }
+            )
+
+        allocation.student = students[student_id]
+        allocation.sponsor = sponsors[sponsor_id]
+        allocation.allocated_money = allocated_money
+        allocation.clean()
+        allocation.save(validate=False)
+
+    return allocation
+
+
+def release(allocation):
+    """Delete a StudentSponsor, re-reading it under lock so the released amount is the stored one."""
+    with transaction.atomic():
+        allocation = StudentSponsor.objects.select_for_update().filter(id=allocation.id).first()
+        if allocation is None:
+            raise Http404("StudentSponsor record not found.")
+        lock_rows({allocation.sponsor_id}, {allocation.student_id})
+        allocation.delete()
+
+
+def allocate_batch(items, atomic=True):
+    """
+    Allocate many (student_id, sponsor_id, allocated_money) items in one transaction.
+    All affected sponsors and students are locked once and every item is checked against their running
+    balances in memory, so the whole batch costs a fixed handful of queries. With atomic=True nothing is
+    written unless every item passes; otherwise the valid items are written and the rest are reported.
+    """
+    with transaction.atomic():
+        sponsors, students = lock_rows({item['sponsor_id'] for item in items}, {item['student_id'] for item in items})
+
+        results, allocations = [], []
+        for index, item in enumerate(items):
+            sponsor = sponsors.get(item['sponsor_id'])
+            student = students.get(item['student_id'])
+            allocated_money = item['allocated_money']
+
+            if sponsor is None:
+                message = 'There is no sponsor found with this id.'
+            elif student is None:
+                message = 'Student with this id does not exist.'
+            else:
+                message = StudentSponsor.allocation_error(sponsor, student, allocated_money,
+                                                          sponsor.allocated_total, student.allocated_total)
+
+            if message:
+                results.append({'index': index, 'success': False, 'message': message})
+                continue
+
+            sponsor.allocated_total += allocated_money
+            student.allocated_total += allocated_money
+            allocations.append(StudentSponsor(student=student, sponsor=sponsor, allocated_money=allocated_money))
+            results.append({'index': index, 'success': True})
+
+        failed = len(results) - len(allocations)
+        if allocations and not (atomic and failed):
+            StudentSponsor.objects.bulk_create(allocations)
+            updated_at = timezone.now()  # bulk_update() skips auto_now
+            for allocation in allocations:
+                allocation.sponsor.updated_at = allocation.student.updated_at = updated_at
+            Sponsor.objects.bulk_update({allocation.sponsor for allocation in allocations},
+                                        ['allocated_total', 'updated_at'])
+            Student.objects.bulk_update({allocation.student for allocation in allocations},
+                                        ['allocated_total', 'updated_at'])
+            # bulk_create sends no post_save, so the summary is moved here.
+            DashboardSummary.record(total_paid_amount=sum(allocation.allocated_money for allocation in allocations))
+
+            created = iter(allocations)
+            for result in results:
+                if result['success']:
+                    result['id'] = next(created).id
+        else:
+            allocations = []
+            for result in results:
+                if result['success']:
+                    result.update(success=False, message='Not allocated because another item in the batch failed.')
+
+    return allocations, results
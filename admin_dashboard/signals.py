@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from main.models import Student, Sponsor, StudentSponsor
+from .analytics import forget_period
+from .models import DashboardSummary
+
+
+def stored_tuition_fee(instance):
+    stored = getattr(instance, '_stored_tuition_fee', None)  # Set by Student.from_db() unless it was deferred
+    return instance.tuition_fee if stored is None else stored
+
+
+def forget_period_on_commit(instance):
+    # Rows are only ever added to the open period; updating or deleting an older one invalidates its cached totals.
+    created_at = instance.created_at
+    if created_at is not None:
+        transaction.on_commit(lambda: forget_period(created_at))
+
+
+@receiver(post_save, sender=Student)
+def record_student_saved(sender, instance, created, **kwargs):
+    if created:
+        DashboardSummary.record(student_count=1, total_asked_amount=instance.tuition_fee)
+    else:
+        DashboardSummary.record(total_asked_amount=instance.tuition_fee - stored_tuition_fee(instance))
+    instance._stored_tuition_fee = instance.tuition_fee
+
+
+@receiver(pre_delete, sender=Student)
+def record_student_deleted(sender, instance, **kwargs):
+    DashboardSummary.record(student_count=-1, total_asked_amount=-stored_tuition_fee(instance))
+    forget_period_on_commit(instance)
+
+
+@receiver(post_save, sender=Sponsor)
+def record_sponsor_saved(sender, instance, created, **kwargs):
+    if created:
+        DashboardSummary.record(sponsor_count=1)
+
+
+@receiver(pre_delete, sender=Sponsor)
+def record_sponsor_deleted(sender, instance, **kwargs):
+    DashboardSummary.record(sponsor_count=-1)
+    forget_period_on_commit(instance)
+
+
+@receiver(post_save, sender=StudentSponsor)
+def record_allocation_saved(sender, instance, created, **kwargs):
+    # Sent from inside StudentSponsor.save(), before the stored allocation is replaced by the new one.
+    stored = instance._stored_allocation()
+    stored_money = stored[2] if stored else 0
+    DashboardSummary.record(total_paid_amount=instance.allocated_money - stored_money)
+    if not created and instance.allocated_money != stored_money:
+        forget_period_on_commit(instance)
+
+
+@receiver(pre_delete, sender=StudentSponsor)
+def record_allocation_deleted(sender, instance, **kwargs):
+    stored = instance._stored_allocation() or instance._current_allocation()
+    DashboardSummary.record(total_paid_amount=-stored[2])
+    forget_period_on_commit(instance)
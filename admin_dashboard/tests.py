@@ -1,3 +1,596 @@
+import base64
+import json
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from shared.conditional import ConditionalGetMixin
+from shared.testing import QueryCountMixin
+from shared.utils import token
+
+from main.models import Sponsor, Student, StudentSponsor
+from . import analytics
+from .analytics import time_series
+from .models import DashboardSummary
+from .filters import filter_sponsors, filter_students
+from .views import ExportAPIView, SponsorDetailUpdateDeleteAPIView
+
+
+def create_sponsor(**kwargs):
+    data = {
+        'sponsor_type': 'individual',
+        'full_name': 'Sponsor',
+        'phone_number': '+998901234567',
+        'payment_type': 'cash',
+        'total_sponsorship_amount': 1000000,
+        'status': 'verified',
+    }
+    data.update(kwargs)
+    return Sponsor.objects.create(**data)
+
+
+def create_student(**kwargs):
+    data = {
+        'full_name': 'Student',
+        'phone_number': '+998901234567',
+        'university': 'TATU',
+        'degree': 'bachelor',
+        'tuition_fee': 5000000,
+    }
+    data.update(kwargs)
+    return Student.objects.create(**data)
+
+
+def local_datetime(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class FilterPredicateTests(TestCase):
+    """The list filters must compare raw columns with constants so the b-tree indexes stay usable."""
+
+    def assertIndexFriendly(self, queryset):
+        sql = str(queryset.query).upper()
+        for unindexable in ('CAST_DATE', '::DATE', 'AT TIME ZONE', 'UPPER(', ' LIKE '):
+            self.assertNotIn(unindexable, sql)
+
+    def test_sponsor_filters_emit_range_predicates(self):
+        query_params = QueryDict('status=verified&amount=1000000&start_date=01-03-2025&end_date=31-03-2025')
+        self.assertIndexFriendly(filter_sponsors(Sponsor.objects.all(), query_params))
+
+    def test_student_degree_filter_is_exact(self):
+        query_params = QueryDict('degree=master')
+        self.assertIndexFriendly(filter_students(Student.objects.with_funding(), query_params))
+
+    def test_date_range_includes_whole_end_date_in_local_time(self):
+        inside = create_sponsor(full_name='Inside')
+        before = create_sponsor(full_name='Before')
+        after = create_sponsor(full_name='After')
+        Sponsor.objects.filter(id=inside.id).update(created_at=local_datetime(2025, 3, 31, 23, 59))
+        Sponsor.objects.filter(id=before.id).update(created_at=local_datetime(2025, 2, 28, 23, 59))
+        Sponsor.objects.filter(id=after.id).update(created_at=local_datetime(2025, 4, 1, 0, 0))
+
+        sponsors = filter_sponsors(Sponsor.objects.all(), QueryDict('start_date=01-03-2025&end_date=31-03-2025'))
+
+        self.assertEqual([sponsor.id for sponsor in sponsors], [inside.id])
+
+    def test_funding_filter_splits_students_by_allocated_money(self):
+        sponsor = create_sponsor(total_sponsorship_amount=10000000)
+        unfunded = create_student(full_name='Unfunded')
+        partial = create_student(full_name='Partial')
+        full = create_student(full_name='Full')
+        StudentSponsor.objects.create(sponsor=sponsor, student=partial, allocated_money=1000000)
+        StudentSponsor.objects.create(sponsor=sponsor, student=full, allocated_money=5000000)
+
+        for funding, student in (('unfunded', unfunded), ('partial', partial), ('full', full)):
+            with self.subTest(funding=funding):
+                students = filter_students(Student.objects.with_funding(), QueryDict(f'funding={funding}'))
+                self.assertEqual([student.id for student in students], [student.id])
+
+    def test_remaining_bounds_must_be_finite_numbers(self):
+        for param in ('min_remaining', 'max_remaining'):
+            for value in ('abc', 'nan', 'inf', '-inf', 'Infinity'):
+                with self.subTest(param=param, value=value), self.assertRaises(ValidationError) as raised:
+                    filter_students(Student.objects.with_funding(), QueryDict(f'{param}={value}'))
+                self.assertIn(param, raised.exception.detail)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are only checked on PostgreSQL.')
+class FilterQueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(20):
+            create_sponsor(full_name=f'Sponsor {i}', status=['new', 'verified'][i % 2],
+                           total_sponsorship_amount=1000000 + i * 100000)
+            create_student(full_name=f'Student {i}', degree=['bachelor', 'master'][i % 2])
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            # The test tables are tiny; without this the planner rightly prefers a sequential scan.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_status_and_date_range_use_status_created_index(self):
+        sponsors = filter_sponsors(Sponsor.objects.all(),
+                                   QueryDict('status=verified&start_date=01-03-2025&end_date=31-03-2025'))
+        self.assertUsesIndex(sponsors, 'sponsors_status_created_idx')
+
+    def test_status_and_amount_use_status_amount_index(self):
+        sponsors = filter_sponsors(Sponsor.objects.all(), QueryDict('status=verified&amount=1500000'))
+        self.assertUsesIndex(sponsors, 'sponsors_status_amount_idx')
+
+    def test_date_range_uses_created_at_index(self):
+        sponsors = filter_sponsors(Sponsor.objects.all(), QueryDict('start_date=01-03-2025&end_date=31-03-2025'))
+        self.assertUsesIndex(sponsors, 'sponsors_created_at_id_idx')
+
+    def test_degree_uses_degree_created_index(self):
+        students = filter_students(Student.objects.with_funding(), QueryDict('degree=master'))
+        self.assertUsesIndex(students, 'students_degree_created_idx')
+
+    def test_university_uses_upper_university_index(self):
+        students = filter_students(Student.objects.with_funding(), QueryDict('university=tatu'))
+        self.assertUsesIndex(students, 'students_university_upper_idx')
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.last_month = (self.today.replace(day=1) - timedelta(days=1)).replace(day=1)
+        self.sponsor = create_sponsor()
+        self.student = create_student()
+        self.allocation = StudentSponsor.objects.create(sponsor=self.sponsor, student=self.student,
+                                                        allocated_money=1000)
+        StudentSponsor.objects.filter(pk=self.allocation.pk).update(
+            created_at=timezone.make_aware(datetime.combine(self.last_month, datetime.min.time())) + timedelta(hours=12)
+        )
+
+    def series(self):
+        return {row['period']: row for row in time_series(self.last_month, self.today, 'month')}
+
+    def test_groups_rows_by_period(self):
+        series = self.series()
+        self.assertEqual(series[self.last_month.isoformat()]['allocated_money'], 1000)
+        self.assertEqual(series[self.today.replace(day=1).isoformat()]['sponsor_count'], 1)
+
+    def test_closed_periods_are_cached_and_only_the_open_period_is_recomputed(self):
+        self.series()
+        with mock.patch.object(analytics, 'compute_periods', wraps=analytics.compute_periods) as compute_periods:
+            self.series()
+        compute_periods.assert_called_once_with('month', self.today.replace(day=1), mock.ANY)
+
+    def test_changing_a_closed_period_drops_its_cached_totals(self):
+        self.series()
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation = StudentSponsor.objects.get(pk=self.allocation.pk)
+            allocation.allocated_money = 2500
+            allocation.save()
+        self.assertEqual(self.series()[self.last_month.isoformat()]['allocated_money'], 2500)
+
+    def test_per_process_caches_expire_closed_periods(self):
+        with mock.patch.object(analytics.cache, 'set_many') as set_many:
+            self.series()
+        self.assertEqual(set_many.call_args.kwargs['timeout'], 300)
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+        DashboardSummary.rebuild()
+
+    def assertInSync(self):
+        live = DashboardSummary(**DashboardSummary.live_totals()).to_dict()
+        self.assertEqual(DashboardSummary.load().to_dict(), live)
+
+    def test_summary_follows_every_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sponsor = create_sponsor(total_sponsorship_amount=10 ** 7)
+            other_sponsor = create_sponsor(total_sponsorship_amount=10 ** 7)
+            student = create_student()
+            other_student = create_student(tuition_fee=3000000)
+        self.assertInSync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation = StudentSponsor.objects.create(sponsor=sponsor, student=student, allocated_money=1000)
+            StudentSponsor.objects.create(sponsor=other_sponsor, student=other_student, allocated_money=2000)
+        self.assertInSync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation.allocated_money = 1500
+            allocation.student = other_student
+            allocation.save()
+            student.tuition_fee = 6000000
+            student.save()
+            Student.objects.get(pk=other_student.pk).save()  # Unchanged
+        self.assertInSync()
+
+        rows = 'full_name,phone_number,university,degree,tuition_fee\nImported,+998901234567,TATU,bachelor,4000000\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin-dashboard/students/import/',
+                                        {'file': SimpleUploadedFile('students.csv', rows.encode())}, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            items = [{'student_id': student.id, 'sponsor_id': sponsor.id, 'allocated_money': amount}
+                     for amount in (3000, 4000)]
+            response = self.client.post('/admin-dashboard/student-sponsors/batch/', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertInSync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            allocation.delete()
+            other_student.delete()  # Cascades to its remaining allocation
+            sponsor.delete()  # Cascades to the batch
+        self.assertInSync()
+        self.assertEqual(DashboardSummary.load().to_dict(), {
+            'student_count': 2, 'sponsor_count': 1, 'total_paid_amount': 0,
+            'total_asked_amount': 10000000, 'remaining_unpaid_amount': 10000000,
+        })
+
+    def test_rebuild_dashboard_summary_repairs_a_drifted_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentSponsor.objects.create(sponsor=create_sponsor(), student=create_student(), allocated_money=1000)
+        DashboardSummary.objects.filter(pk=1).update(student_count=5, total_paid_amount=0)
+
+        output = StringIO()
+        with self.assertRaisesMessage(CommandError, '2 summary total(s) drifted.'):
+            call_command('rebuild_dashboard_summary', '--check', stdout=output)
+        self.assertIn('student_count: stored 5, actual 1', output.getvalue())
+        self.assertIn('total_paid_amount: stored 0.0, actual 1000', output.getvalue())
+
+        call_command('rebuild_dashboard_summary', stdout=StringIO())
+        self.assertInSync()
+        self.assertEqual(DashboardSummary.load().total_paid_amount, 1000)
+        call_command('rebuild_dashboard_summary', '--check', stdout=StringIO())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+        self.sponsor = create_sponsor()
+        self.student = create_student()
+
+    def assertNotModifiedAfterOneQuery(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+    def test_list_detail_and_summary_answer_304(self):
+        for url in ('/admin-dashboard/sponsors/', f'/admin-dashboard/sponsors/{self.sponsor.id}',
+                    '/admin-dashboard/students/', f'/admin-dashboard/students/{self.student.id}/',
+                    '/admin-dashboard/summary/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotModifiedAfterOneQuery(url, if_none_match=response['ETag'])
+            self.assertNotIn('Last-Modified', response)
+
+    def test_views_without_a_queryset_must_define_validators(self):
+        with self.assertRaises(ImproperlyConfigured):
+            type('NoValidatorsAPIView', (ConditionalGetMixin, APIView), {})
+
+    def test_default_validators_follow_the_looked_up_object(self):
+        view = SponsorDetailUpdateDeleteAPIView(kwargs={'id': self.sponsor.id})
+        create_sponsor(full_name='Other')
+        self.assertEqual(ConditionalGetMixin.get_validators(view), (self.sponsor.updated_at, 1))
+
+    def test_allocation_changes_sponsor_list_etag(self):
+        etag = self.client.get('/admin-dashboard/sponsors/')['ETag']
+        StudentSponsor.objects.create(sponsor=self.sponsor, student=self.student, allocated_money=1000)
+        response = self.client.get('/admin-dashboard/sponsors/', headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['result'][0]['money_spent'], 1000)
+
+    def test_deleting_a_row_is_not_answered_with_304(self):
+        create_student(full_name='Second Student')
+        etag = self.client.get('/admin-dashboard/students/')['ETag']
+        self.student.delete()
+        for headers in ({'if_none_match': etag}, {'if_modified_since': http_date(time.time())}):
+            response = self.client.get('/admin-dashboard/students/', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], 1)
+
+
+class WriteValidationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+        self.sponsor = create_sponsor()
+        self.student = create_student()
+
+    def allocate(self, allocated_money, sponsor_id=None):
+        return self.client.post(f'/admin-dashboard/students/{self.student.id}/sponsors/',
+                                {'sponsor_id': sponsor_id or self.sponsor.id, 'allocated_money': allocated_money},
+                                format='json')
+
+    def test_api_allocations_are_validated_once(self):
+        with mock.patch.object(StudentSponsor, 'full_clean') as full_clean:
+            self.assertEqual(self.allocate(1000).status_code, 201)
+            self.assertEqual(self.allocate(10 ** 7).data['message'], 'Sponsor does not have enough funds available.')
+            self.assertEqual(self.allocate(1000, sponsor_id=self.student.id).data['message'],
+                             'There is no sponsor found with this id.')
+        full_clean.assert_not_called()
+        self.assertEqual(Sponsor.objects.get(id=self.sponsor.id).allocated_total, 1000)
+
+    def test_direct_saves_are_still_fully_validated(self):
+        with self.assertRaises(ValidationError):
+            create_sponsor(sponsor_type='legal_entity')
+        self.sponsor.status = 'new'
+        self.sponsor.save()
+        allocation = StudentSponsor(sponsor=self.sponsor, student=self.student, allocated_money=1000)
+        with self.assertRaises(ValidationError):
+            allocation.save()
+        self.assertFalse(StudentSponsor.objects.exists())
+
+    def test_partial_sponsor_updates_are_checked_against_stored_fields(self):
+        url = f'/admin-dashboard/sponsors/{self.sponsor.id}'
+        with mock.patch.object(Sponsor, 'full_clean') as full_clean:
+            response = self.client.patch(url, {'company_name': 'Company'}, format='json')
+            self.assertEqual(response.data['message'], ['Individuals should not have company name.'])
+            self.assertEqual(self.client.patch(url, {'sponsor_type': 'legal_entity'}, format='json').data['message'],
+                             ['Company name is required for legal entities.'])
+            response = self.client.patch(url, {'sponsor_type': 'legal_entity', 'company_name': 'Company'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.patch(url, {'full_name': 'Renamed'}, format='json').status_code, 200)
+            response = self.client.patch(url, {'sponsor_type': 'individual'}, format='json')
+            self.assertEqual((response.status_code, response.data['company_name']), (200, None))
+        full_clean.assert_not_called()
+
+    def test_sponsor_phone_numbers_are_normalized(self):
+        url = f'/admin-dashboard/sponsors/{self.sponsor.id}'
+        response = self.client.patch(url, {'phone_number': '+998 (90) 765-43-21'}, format='json')
+        self.assertEqual(response.data['phone_number'], '+998907654321')
+        response = self.client.patch(url, {'phone_number': 'call me'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchAllocationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+        self.sponsor = create_sponsor()
+        self.student = create_student()
+
+    def allocate_batch(self, *amounts, **data):
+        items = [{'student_id': self.student.id, 'sponsor_id': self.sponsor.id, 'allocated_money': amount}
+                 for amount in amounts]
+        return self.client.post('/admin-dashboard/student-sponsors/batch/', {'items': items, **data}, format='json')
+
+    def test_amounts_must_be_positive(self):
+        for amount in (-5000000, 0):
+            response = self.allocate_batch(amount)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('allocated_money', response.data['items'][0])
+        self.sponsor.refresh_from_db()
+        self.assertEqual(self.sponsor.allocated_total, 0)
+        self.assertFalse(StudentSponsor.objects.exists())
+
+    def test_atomic_batch_rolls_back_when_one_item_fails(self):
+        response = self.allocate_batch(1000, 10 ** 8, 2000)  # The second is more than the sponsor has
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data['created'], response.data['failed']), (0, 3))
+        self.assertEqual(response.data['results'][1]['message'], 'Sponsor does not have enough funds available.')
+        self.assertEqual(response.data['results'][0]['message'],
+                         'Not allocated because another item in the batch failed.')
+        self.assertFalse(StudentSponsor.objects.exists())
+        self.sponsor.refresh_from_db()
+        self.student.refresh_from_db()
+        self.assertEqual((self.sponsor.allocated_total, self.student.allocated_total), (0, 0))
+
+    def test_partial_batch_keeps_the_valid_items(self):
+        response = self.allocate_batch(1000, 10 ** 8, 2000, atomic=False)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertEqual([result['success'] for result in response.data['results']], [True, False, True])
+        self.assertEqual(response.data['results'][1]['message'], 'Sponsor does not have enough funds available.')
+        self.assertEqual(sorted(StudentSponsor.objects.values_list('allocated_money', flat=True)), [1000, 2000])
+        self.sponsor.refresh_from_db()
+        self.student.refresh_from_db()
+        self.assertEqual((self.sponsor.allocated_total, self.student.allocated_total), (3000, 3000))
+
+
+class AsyncReadEndpointTests(TestCase):
+    def setUp(self):
+        access_token = token(User.objects.create_user('staff', password='password', is_staff=True))['access_token']
+        self.headers = {'Authorization': f'Bearer {access_token}'}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.sponsor = create_sponsor()
+        self.student = create_student()
+
+    async def test_async_endpoints_return_what_the_drf_views_return(self):
+        for path in ('sponsors/?page_size=1', f'sponsors/{self.sponsor.id}', 'students/?degree=bachelor',
+                     f'students/{self.student.id}/', 'summary/', 'students/?degree=unknown'):
+            expected = await sync_to_async(self.client.get)(f'/admin-dashboard/{path}')
+            response = await self.async_client.get(f'/admin-dashboard/async/{path}', headers=self.headers)
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(response.json(), expected.json(), path)
+
+    async def test_async_endpoints_require_a_staff_token(self):
+        self.assertEqual((await self.async_client.get('/admin-dashboard/async/summary/')).status_code, 401)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+
+    def test_invalid_cursor_ids_are_not_found(self):
+        for pk in ('not-a-uuid', None, ['x'], True):
+            cursor = base64.urlsafe_b64encode(json.dumps({'c': '2025-03-01T00:00:00+00:00', 'i': pk}).encode())
+            response = self.client.get('/admin-dashboard/sponsors/', {'cursor': cursor.decode()})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+    def test_walking_next_and_previous_links_visits_every_row_once(self):
+        sponsors = [create_sponsor(full_name=f'Sponsor {i}') for i in range(7)]
+        # Ties on created_at must be broken by id, or rows on a page boundary get skipped or repeated.
+        Sponsor.objects.filter(id__in=[sponsor.id for sponsor in sponsors[1:6]]).update(
+            created_at=local_datetime(2025, 3, 1, 12, 0))
+        expected = list(Sponsor.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        pages, url = [], '/admin-dashboard/sponsors/?pagination=cursor&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([UUID(sponsor['id']) for sponsor in response.data['result']])
+            url = response.data['links']['next']
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+        walked_back = []
+        url = response.data['links']['previous']
+        while url:
+            response = self.client.get(url)
+            walked_back.insert(0, [UUID(sponsor['id']) for sponsor in response.data['result']])
+            url = response.data['links']['previous']
+        self.assertEqual(walked_back, pages[:-1])
+
+    def test_search_can_not_be_cursor_paginated(self):
+        create_sponsor(full_name='Aziz')
+        response = self.client.get('/admin-dashboard/sponsors/', {'pagination': 'cursor', 'search': 'Aziz'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('relevance', response.data['message'])
+        response = self.client.get('/admin-dashboard/sponsors/', {'pagination': 'cursor', 'search': ' '})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['result']), 1)
+
+
+class ImportExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+
+    def test_import_rejects_files_that_are_not_utf8(self):
+        rows = 'full_name,phone_number,university,degree,tuition_fee\nJosé,+998901234567,TATU,bachelor,5000000\n'
+        file = SimpleUploadedFile('students.csv', rows.encode('latin-1'))
+        response = self.client.post('/admin-dashboard/students/import/', {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+        self.assertFalse(Student.objects.exists())
+
+    def test_csv_cells_are_not_formulas(self):
+        create_sponsor(full_name='=HYPERLINK("http://example.com","Open")', sponsor_type='legal_entity',
+                       company_name='-2+3')
+        response = self.client.get('/admin-dashboard/sponsors/export/?file_format=csv')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('"\'=HYPERLINK(""http://example.com"",""Open"")"', content)
+        self.assertIn("'-2+3", content)
+
+    def test_export_views_must_define_their_rows_and_columns(self):
+        with self.assertRaises(ImproperlyConfigured):
+            type('NoColumnsExportAPIView', (ExportAPIView,), {'queryset': Sponsor.objects.all()})
+        with self.assertRaises(ImproperlyConfigured):
+            type('NoQuerysetExportAPIView', (ExportAPIView,), {'columns': [('id', 'ID')]})
+
+
+class QueryCountTests(QueryCountMixin, TestCase):
+    """Every admin dashboard endpoint runs a fixed number of queries, whatever the page size or related rows."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+        self.sponsor = create_sponsor(total_sponsorship_amount=10 ** 9)
+        self.student = create_student(tuition_fee=10 ** 9)
+
+    def seed(self, count):
+        """Add `count` sponsors and students, each allocated to self.student or from self.sponsor."""
+        for _ in range(count):
+            self.latest_sponsor = create_sponsor()
+            student = create_student()
+            StudentSponsor.objects.create(sponsor=self.latest_sponsor, student=self.student, allocated_money=1000)
+            StudentSponsor.objects.create(sponsor=self.sponsor, student=student, allocated_money=1000)
+        cache.clear()  # Analytics keeps closed periods in the cache
+
+    def assertGetQueries(self, url, max_queries):
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.get(url(size)), max_queries)
+
+    def test_sponsor_list(self):
+        self.assertGetQueries(lambda size: f'/admin-dashboard/sponsors/?page_size={size}', 3)
+        self.assertGetQueries(lambda size: f'/admin-dashboard/sponsors/?page_size={size}&status=verified&search=Spo', 3)
+
+    def test_sponsor_detail(self):
+        self.assertGetQueries(lambda size: f'/admin-dashboard/sponsors/{self.sponsor.id}', 2)
+
+    def test_student_list(self):
+        self.assertGetQueries(lambda size: f'/admin-dashboard/students/?page_size={size}', 3)
+
+    def test_student_detail(self):
+        self.assertGetQueries(lambda size: f'/admin-dashboard/students/{self.student.id}/', 2)
+
+    def test_student_sponsor_list(self):
+        self.assertGetQueries(lambda size: f'/admin-dashboard/students/{self.student.id}/sponsors/?page_size={size}', 3)
+
+    def test_student_sponsor_detail(self):
+        self.assertGetQueries(
+            lambda size: f'/admin-dashboard/students/{self.student.id}/sponsors/{self.latest_sponsor.id}/', 2)
+
+    def test_exports(self):
+        for path in ('sponsors', 'students', 'student-sponsors'):
+            self.assertGetQueries(lambda size: f'/admin-dashboard/{path}/export/?file_format=csv', 1)
+
+    def test_summary_and_analytics(self):
+        self.assertGetQueries(lambda size: '/admin-dashboard/summary/', 2)
+        self.assertGetQueries(lambda size: '/admin-dashboard/analytics/?granularity=day', 3)
+
+    def test_updates(self):
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.patch(
+            f'/admin-dashboard/sponsors/{self.sponsor.id}', {'full_name': f'Sponsor {size}'}, format='json'), 3)
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.patch(
+            f'/admin-dashboard/students/{self.student.id}/', {'full_name': f'Student {size}'}, format='json'), 3)
+
+    def test_student_create_and_import(self):
+        data = {'full_name': 'Student', 'phone_number': '+998901234567', 'university': 'TATU', 'degree': 'bachelor',
+                'tuition_fee': 5000000}
+        self.assertQueriesIndependentOf(
+            self.seed, lambda size: self.client.post('/admin-dashboard/students/', data, format='json'), 1)
+
+        def import_rows(size):
+            rows = ''.join(f'Student {i},+998901234567,TATU,bachelor,5000000\n' for i in range(size))
+            file = SimpleUploadedFile('students.csv', f'full_name,phone_number,university,degree,tuition_fee\n{rows}'.encode())
+            return self.client.post('/admin-dashboard/students/import/', {'file': file}, format='multipart')
+
+        self.assertQueriesIndependentOf(self.seed, import_rows, 3)
+
+    def test_allocation_create_and_update(self):
+        student = create_student(tuition_fee=10 ** 9)
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.post(
+            f'/admin-dashboard/students/{student.id}/sponsors/',
+            {'sponsor_id': self.latest_sponsor.id, 'allocated_money': 1000}, format='json'), 9)
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.put(
+            f'/admin-dashboard/students/{self.student.id}/sponsors/{self.latest_sponsor.id}/',
+            {'sponsor_id': self.latest_sponsor.id, 'allocated_money': 1000 + size}, format='json'), 11)
+
+    def test_allocation_delete(self):
+        def delete(size):
+            return self.client.delete(f'/admin-dashboard/students/{self.student.id}/sponsors/{self.latest_sponsor.id}/')
+
+        self.assertQueriesIndependentOf(self.seed, delete, 9)
+
+    def test_batch_allocation(self):
+        def allocate_batch(size):
+            items = [{'student_id': student.id, 'sponsor_id': self.sponsor.id, 'allocated_money': 1}
+                     for student in Student.objects.exclude(id=self.student.id)[:size]]
+            return self.client.post('/admin-dashboard/student-sponsors/batch/', {'items': items}, format='json')
 
-# Create your tests here.
+        self.assertQueriesIndependentOf(self.seed, allocate_batch, 8)
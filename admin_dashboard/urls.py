@@ -4,10 +4,16 @@ from . import views
 
 urlpatterns = [
     path('sponsors/', views.SponsorListAPIView.as_view(), name='sponsor_list'),
+    path('sponsors/export/', views.SponsorExportAPIView.as_view(), name='sponsor_export'),
     path('sponsors/<uuid:id>', views.SponsorDetailUpdateDeleteAPIView.as_view(), name='sponsor_detail_update_delete'),
     path('students/', views.StudentListCreateAPIView.as_view(), name='student_list_create'),
+    path('students/export/', views.StudentExportAPIView.as_view(), name='student_export'),
+    path('students/import/', views.StudentImportAPIView.as_view(), name='student_import'),
     path('students/<uuid:id>/', views.StudentDetailUpdateDeleteAPIView.as_view(), name='student_detail_update_delete'),
     path('students/<uuid:student_id>/sponsors/', views.StudentSponsorListCreate.as_view(), name="student_sponsor_list_create"),
     path('students/<uuid:student_id>/sponsors/<uuid:sponsor_id>/', views.StudentSponsorDetailUpdateDeleteAPIView.as_view(), name='student_sponsor_detail_update_delete'),
+    path('student-sponsors/export/', views.StudentSponsorExportAPIView.as_view(), name='student_sponsor_export'),
+    path('student-sponsors/batch/', views.StudentSponsorBatchCreateAPIView.as_view(), name='student_sponsor_batch_create'),
+    path('analytics/', views.AnalyticsAPIView.as_view(), name='analytics'),
     path('summary/', views.StudentSponsorSummaryAPIView.as_view(), name='student_sponsor_summary')
 ]
\ No newline at end of file
@@ -1,20 +1,51 @@
-from django.db.models import Q, Sum
+from django.core.exceptions import ImproperlyConfigured
 from django.http import Http404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
-from shared.custom_pagination import CustomPagination
-from .serializers import SponsorSerializer, StudentSerializer, StudentSponsorSerializer
+from shared.conditional import ConditionalGetMixin, queryset_validators
+from shared.custom_pagination import CustomPagination, OptionalCursorPaginationMixin
+from shared.exports import export_response, CSV, EXPORT_FORMATS
+from shared.idempotency import IdempotentCreateMixin
+from .analytics import GRANULARITIES, MAX_PERIODS, default_start_date, period_starts, time_series
+from .filters import filter_sponsors, filter_students, parse_date
+from .models import DashboardSummary
+from .importers import detect_format, read_rows, import_students
+from .serializers import (SponsorSerializer, StudentSerializer, StudentSponsorSerializer,
+                          StudentSponsorBatchSerializer, StudentImportSerializer)
+from .services import allocate, allocate_batch, release
 from shared.permissions import IsStaffUser
 from main.models import Sponsor, Student, StudentSponsor
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
-from datetime import datetime
+from django.utils import timezone
+import io
+from uuid import UUID
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter, extend_schema_view
 from rest_framework.exceptions import ValidationError
 
 
+# Pagination
+
+CURSOR_PAGINATION_PARAMETERS = [  # For the list views using OptionalCursorPaginationMixin
+    OpenApiParameter(
+        name='pagination',
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="Set to 'cursor' to page with next/previous cursors instead of page numbers (no count)."
+    ),
+    OpenApiParameter(
+        name='cursor',
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="Opaque cursor taken from links.next or links.previous."
+    ),
+]
+
+
 # Sponsor
 
 @extend_schema(
@@ -28,7 +59,8 @@ from rest_framework.exceptions import ValidationError
                 name='search',
                 type=str,
                 location=OpenApiParameter.QUERY,
-                description="Search sponsors by full name."
+                description=("Fuzzy search sponsors by full name or company name, best matches first. "
+                             "Can not be combined with pagination=cursor.")
             ),
             OpenApiParameter(
                 name='status',
@@ -53,55 +85,20 @@ from rest_framework.exceptions import ValidationError
                 type=str,
                 location=OpenApiParameter.QUERY,
                 description="Filter sponsors created before this date (format: DD-MM-YYYY)"
-            )
+            ),
+            *CURSOR_PAGINATION_PARAMETERS
         ]
     )
-class SponsorListAPIView(generics.ListAPIView):
+class SponsorListAPIView(ConditionalGetMixin, OptionalCursorPaginationMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
+    replica_reads = True  # GET and HEAD read from a replica, see shared.middleware.ReplicaRoutingMiddleware
     serializer_class = SponsorSerializer
     pagination_class = CustomPagination
 
     def get_queryset(self):
-        # Searching
-        search = self.request.query_params.get('search', '')
-        # Filtering
-        application_status = self.request.query_params.get('status', None)
-        total_sponsorship_amount = self.request.query_params.get('amount', None)  # This searches for what is greater than the amount
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-
-        filters = Q()
-
-        filters &= Q(full_name__icontains=search)
-
-        if application_status:
-            if application_status not in ['new', 'in_progress', 'verified', 'cancelled']:
-                raise ValidationError({'status': 'Invalid status.'})
-            filters &= Q(status__iexact=application_status)
-
-        if total_sponsorship_amount:
-            try:
-                total_sponsorship_amount = int(total_sponsorship_amount)
-                filters &= Q(total_sponsorship_amount__gte=total_sponsorship_amount)
-            except ValueError:
-                raise ValidationError({'amount': 'Amount must be a valid integer.'})
-
-        if start_date:
-            try:
-                parsed_date = datetime.strptime(start_date, '%d-%m-%Y').date()
-                filters &= Q(created_at__date__gte=parsed_date)
-            except ValueError:
-                raise ValidationError({'start_date': "Invalid date format"})
-
-        if end_date:
-            try:
-                parsed_date = datetime.strptime(end_date, '%d-%m-%Y').date()
-                filters &= Q(created_at__date__lte=parsed_date)
-            except ValueError as e:
-                raise ValidationError({'end_date': "Invalid date format"})
-
-        sponsors = Sponsor.objects.filter(filters)
-        return sponsors
+        sponsors = Sponsor.objects.with_funds().order_by('-created_at', '-id')
+        return filter_sponsors(sponsors, self.request.query_params)
+
 
 @extend_schema(
     request=SponsorSerializer,
@@ -115,12 +112,21 @@ class SponsorListAPIView(generics.ListAPIView):
             Sponsor application status -> new, in_progress, verified, cancelled  # Yangi, Jarayonda, Tasdiqlandi, Rad etildi
     """
 )
-class SponsorDetailUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPIView):
+class SponsorDetailUpdateDeleteAPIView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
+    replica_reads = True
     serializer_class = SponsorSerializer
-    queryset = Sponsor.objects.all()
+    queryset = Sponsor.objects.with_funds()
     lookup_field = 'id'
 
+    def get_validators(self):
+        return queryset_validators(Sponsor.objects.filter(id=self.kwargs['id']), 'updated_at')
+
+    def perform_update(self, serializer):
+        instance = serializer.save()
+        # Annotations are stale once total_sponsorship_amount changes, so reload them.
+        serializer.instance = self.get_queryset().get(id=instance.id)
+
 
 # Student
 
@@ -137,7 +143,8 @@ class SponsorDetailUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPIView):
                 name='search',
                 type=str,
                 location=OpenApiParameter.QUERY,
-                description="Search students by full name."
+                description=("Fuzzy search students by full name or university, best matches first. "
+                             "Can not be combined with pagination=cursor.")
             ),
             OpenApiParameter(
                 name='degree',
@@ -150,35 +157,37 @@ class SponsorDetailUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPIView):
                 type=str,
                 location=OpenApiParameter.QUERY,
                 description="Filter students by university."
-            )
+            ),
+            OpenApiParameter(
+                name='funding',
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Filter students by funding state. ('unfunded', 'partial', 'full')"
+            ),
+            OpenApiParameter(
+                name='min_remaining',
+                type=float,
+                location=OpenApiParameter.QUERY,
+                description="Filter students whose remaining tuition fee is greater than or equal to this value."
+            ),
+            OpenApiParameter(
+                name='max_remaining',
+                type=float,
+                location=OpenApiParameter.QUERY,
+                description="Filter students whose remaining tuition fee is less than or equal to this value."
+            ),
+            *CURSOR_PAGINATION_PARAMETERS
         ]
     )
-class StudentListCreateAPIView(generics.ListCreateAPIView):
+class StudentListCreateAPIView(ConditionalGetMixin, IdempotentCreateMixin, OptionalCursorPaginationMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
+    replica_reads = True
     serializer_class = StudentSerializer
     pagination_class = CustomPagination
 
     def get_queryset(self):
-        # Searching
-        search = self.request.query_params.get('search', '')
-        # Filtering
-        degree = self.request.query_params.get('degree', None)
-        university = self.request.query_params.get('university', None)
-
-        filters = Q()
-
-        filters &= Q(full_name__icontains=search)
-
-        if degree:
-            if degree not in ['bachelor', 'master']:
-                raise ValidationError({'degree': 'Invalid degree. Degree must be one of them ("bachelor", "master")'})
-            filters &= Q(degree__iexact=degree)
-
-        if university:
-            filters &= Q(university__iexact=university)
-
-        students = Student.objects.filter(filters)
-        return students
+        students = Student.objects.with_funding().order_by('-created_at', '-id')
+        return filter_students(students, self.request.query_params)
 
 
 @extend_schema(
@@ -191,22 +200,79 @@ class StudentListCreateAPIView(generics.ListCreateAPIView):
             Student degrees -> bachelor, master  # Bakalavr, Magistr
         """
     )
-class StudentDetailUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPIView):
+class StudentDetailUpdateDeleteAPIView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
+    replica_reads = True
     serializer_class = StudentSerializer
-    queryset = Student.objects.all()
+    queryset = Student.objects.with_funding()
     lookup_field = 'id'
 
+    def get_validators(self):
+        return queryset_validators(Student.objects.filter(id=self.kwargs['id']), 'updated_at')
+
+    def perform_update(self, serializer):
+        instance = serializer.save()
+        # Annotations are stale once tuition_fee changes, so reload them.
+        serializer.instance = self.get_queryset().get(id=instance.id)
+
+
+@extend_schema(
+        request={'multipart/form-data': StudentImportSerializer},
+        tags=['students'],
+        description="""
+        Import many students from a CSV (with a header row) or JSONL file.
+        Columns/keys: full_name, phone_number, university, degree, tuition_fee
+        Rows are validated like single student creation and the valid ones are saved in chunks.
+        The response reports created and failed counts and the errors of every failed row.
+        """
+    )
+class StudentImportAPIView(generics.CreateAPIView):
+    permission_classes = [IsAuthenticated, IsStaffUser]
+    serializer_class = StudentImportSerializer
+    parser_classes = [MultiPartParser]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        uploaded_file = serializer.validated_data['file']
+
+        try:
+            file_format = detect_format(uploaded_file.name, serializer.validated_data.get('format'))
+        except ValueError as e:
+            raise ValidationError({'format': str(e)})
+
+        # Large uploads are already spooled to a temporary file; wrap it instead of reading it whole.
+        lines = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
+        try:
+            report = import_students(read_rows(lines, file_format))
+        except UnicodeDecodeError:  # Raised while reading, so chunks before the bad bytes are already saved
+            return Response(
+                {
+                    'success': False,
+                    'message': 'The file is not UTF-8 encoded; rows before the first invalid character may '
+                               'have been imported.'
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {
+                'success': report['failed'] == 0,
+                **report
+            }, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST
+        )
+
 
 # StudentSponsor
 
 
 @extend_schema(
         request=StudentSponsorSerializer,
-        tags=['student sponsors']
+        tags=['student sponsors'],
+        parameters=CURSOR_PAGINATION_PARAMETERS
     )
-class StudentSponsorListCreate(generics.ListCreateAPIView):
+class StudentSponsorListCreate(ConditionalGetMixin, IdempotentCreateMixin, OptionalCursorPaginationMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
+    replica_reads = True
     serializer_class = StudentSponsorSerializer
 
 
@@ -222,13 +288,21 @@ class StudentSponsorListCreate(generics.ListCreateAPIView):
         student_id = self.kwargs.get('student_id')
         student=self.get_student(student_id)
 
-        return StudentSponsor.objects.filter(student=student)
+        return StudentSponsor.objects.filter(student=student).select_related('sponsor').order_by('-created_at', '-id')
+
+    def get_validators(self):
+        # The nested sponsors are part of the response, so their updated_at counts too.
+        allocations = StudentSponsor.objects.filter(student_id=self.kwargs.get('student_id'))
+        return queryset_validators(allocations, 'updated_at', 'sponsor__updated_at')
 
     def perform_create(self, serializer):
         student_id = self.kwargs.get('student_id')
-        student = self.get_student(student_id)
 
-        serializer.save(student=student)
+        serializer.instance = allocate(
+            student_id,
+            serializer.validated_data['sponsor_id'],
+            serializer.validated_data['allocated_money']
+        )
 
 
 @extend_schema(
@@ -247,27 +321,243 @@ class StudentSponsorDetailUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPIV
             raise Http404("StudentSponsor record not found.")
         return obj
 
+    def perform_update(self, serializer):
+        instance = serializer.instance
+
+        serializer.instance = allocate(
+            instance.student_id,
+            serializer.validated_data.get('sponsor_id', instance.sponsor_id),
+            serializer.validated_data.get('allocated_money', instance.allocated_money),
+            allocation=instance
+        )
 
-class StudentSponsorSummaryAPIView(APIView):
+    def perform_destroy(self, instance):
+        release(instance)
+
+
+@extend_schema(
+    request=StudentSponsorBatchSerializer,
+    tags=['student sponsors'],
+    description="""
+    Allocate money for many student/sponsor pairs in one request (up to 1000 items).
+    atomic=true (default) writes nothing unless every item is valid.
+    atomic=false writes the valid items and reports the failed ones.
+    Every item gets a result with its index, success flag and either the new allocation id or an error message.
+    """
+)
+class StudentSponsorBatchCreateAPIView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
+    serializer_class = StudentSponsorBatchSerializer
 
-    @extend_schema(
-        tags=['student sponsors']
-    )
-    def get(self, request):
-        student_count = Student.objects.count()
-        sponsor_count = Sponsor.objects.count()
-        total_paid_tuition_fee = StudentSponsor.objects.all().aggregate(total=Sum('allocated_money'))['total'] or 0
-        total_asked_amount = Student.objects.all().aggregate(total=Sum('tuition_fee'))['total'] or 0
-        remaining_unpaid_amount = total_asked_amount - total_paid_tuition_fee
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
+        allocations, results = allocate_batch(
+            serializer.validated_data['items'],
+            atomic=serializer.validated_data['atomic']
+        )
         return Response(
             {
-                'student_count': student_count,
-                'sponsor_count': sponsor_count,
-                'total_paid_amount': total_paid_tuition_fee,
-                'total_asked_amount': total_asked_amount,
-                'remaining_unpaid_amount': remaining_unpaid_amount
-            }
+                'success': len(allocations) == len(results),
+                'created': len(allocations),
+                'failed': len(results) - len(allocations),
+                'results': results
+            }, status=status.HTTP_201_CREATED if allocations else status.HTTP_400_BAD_REQUEST
+        )
+
+
+# Exports
+
+EXPORT_FILE_FORMAT_PARAMETER = OpenApiParameter(
+    name='file_format',
+    type=str,
+    location=OpenApiParameter.QUERY,
+    description="Export file format. ('csv', 'xlsx'), csv by default"
+)
+
+
+class ExportAPIView(APIView):
+    """
+    Streams get_queryset() as a CSV or XLSX file, one server-side cursor chunk at a time. Subclasses set columns
+    and either queryset or get_queryset(); one that doesn't fails when it is defined, not on its first request.
+    """
+    permission_classes = [IsAuthenticated, IsStaffUser]
+    file_name = None
+    columns = []  # (field or annotation name, column title)
+    queryset = None
+
+    def __init_subclass__(cls, **kwargs):
+        super(ExportAPIView, cls).__init_subclass__(**kwargs)
+        if not cls.columns:
+            raise ImproperlyConfigured(f'{cls.__name__} must set columns.')
+        if cls.queryset is None and cls.get_queryset is ExportAPIView.get_queryset:
+            raise ImproperlyConfigured(f'{cls.__name__} must set queryset or override get_queryset().')
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', CSV)
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': 'File format must be one of them ("csv", "xlsx").'})
+        return export_response(self.get_queryset(), self.columns, file_format, self.file_name)
+
+
+@extend_schema(
+    tags=['sponsors'],
+    description="""
+    Export all sponsors matching the sponsor list filters (search, status, amount, start_date, end_date).
+    """,
+    parameters=[EXPORT_FILE_FORMAT_PARAMETER],
+    responses={200: OpenApiTypes.BINARY}
+)
+class SponsorExportAPIView(ExportAPIView):
+    file_name = 'sponsors'
+    columns = [
+        ('id', 'ID'),
+        ('full_name', 'Full name'),
+        ('phone_number', 'Phone number'),
+        ('sponsor_type', 'Sponsor type'),
+        ('company_name', 'Company name'),
+        ('payment_type', 'Payment type'),
+        ('status', 'Status'),
+        ('total_sponsorship_amount', 'Total sponsorship amount'),
+        ('money_spent', 'Money spent'),
+        ('available_funds', 'Available funds'),
+        ('created_at', 'Created at'),
+    ]
+
+    def get_queryset(self):
+        sponsors = Sponsor.objects.with_funds().order_by('-created_at', '-id')
+        return filter_sponsors(sponsors, self.request.query_params)
+
+
+@extend_schema(
+    tags=['students'],
+    description="""
+    Export all students matching the student list filters
+    (search, degree, university, funding, min_remaining, max_remaining).
+    """,
+    parameters=[EXPORT_FILE_FORMAT_PARAMETER],
+    responses={200: OpenApiTypes.BINARY}
+)
+class StudentExportAPIView(ExportAPIView):
+    file_name = 'students'
+    columns = [
+        ('id', 'ID'),
+        ('full_name', 'Full name'),
+        ('phone_number', 'Phone number'),
+        ('university', 'University'),
+        ('degree', 'Degree'),
+        ('tuition_fee', 'Tuition fee'),
+        ('covered_tuition_fee', 'Covered tuition fee'),
+        ('remaining_tuition_fee', 'Remaining tuition fee'),
+        ('created_at', 'Created at'),
+    ]
+
+    def get_queryset(self):
+        students = Student.objects.with_funding().order_by('-created_at', '-id')
+        return filter_students(students, self.request.query_params)
+
+
+@extend_schema(
+    tags=['student sponsors'],
+    description="""
+    Export allocations, optionally only those of one student (student_id) or one sponsor (sponsor_id).
+    """,
+    parameters=[
+        EXPORT_FILE_FORMAT_PARAMETER,
+        OpenApiParameter(name='student_id', type=OpenApiTypes.UUID, location=OpenApiParameter.QUERY),
+        OpenApiParameter(name='sponsor_id', type=OpenApiTypes.UUID, location=OpenApiParameter.QUERY)
+    ],
+    responses={200: OpenApiTypes.BINARY}
+)
+class StudentSponsorExportAPIView(ExportAPIView):
+    file_name = 'student_sponsors'
+    columns = [
+        ('id', 'ID'),
+        ('student_id', 'Student ID'),
+        ('student__full_name', 'Student'),
+        ('sponsor_id', 'Sponsor ID'),
+        ('sponsor__full_name', 'Sponsor'),
+        ('allocated_money', 'Allocated money'),
+        ('created_at', 'Created at'),
+    ]
+
+    def get_queryset(self):
+        allocations = StudentSponsor.objects.order_by('-created_at', '-id')
+        for param in ('student_id', 'sponsor_id'):
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    allocations = allocations.filter(**{param: UUID(value)})
+                except ValueError:
+                    raise ValidationError({param: 'Must be a valid UUID.'})
+        return allocations
+
+
+@extend_schema(
+    tags=['student sponsors'],
+    responses={200: OpenApiTypes.OBJECT}
+)
+class StudentSponsorSummaryAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated, IsStaffUser]
+    replica_reads = True
+
+    def get_validators(self):
+        return queryset_validators(DashboardSummary.objects.filter(pk=1), 'updated_at')
+
+    def retrieve(self, request, *args, **kwargs):
+        summary = DashboardSummary.load()
+        return Response(summary.to_dict())
+
+
+@extend_schema(
+    tags=['student sponsors'],
+    description="""
+    Sponsors and students added, allocations made and money allocated per day, week or month.
+    Periods are whole calendar periods overlapping the date range; totals of closed periods are cached.
+    """,
+    parameters=[
+        OpenApiParameter(
+            name='granularity',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description="Period length. ('day', 'week', 'month'), day by default"
+        ),
+        OpenApiParameter(
+            name='start_date',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description="First day of the range (format: DD-MM-YYYY). Defaults to 30 days, 12 weeks or 12 months back"
+        ),
+        OpenApiParameter(
+            name='end_date',
+            type=str,
+            location=OpenApiParameter.QUERY,
+            description="Last day of the range, inclusive (format: DD-MM-YYYY). Defaults to today"
         )
+    ],
+    responses={200: OpenApiTypes.OBJECT}
+)
+class AnalyticsAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsStaffUser]
 
+    def get(self, request):
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': 'Granularity must be one of them ("day", "week", "month").'})
+
+        end_date = request.query_params.get('end_date')
+        end_date = parse_date(end_date, 'end_date') if end_date else timezone.localdate()
+        start_date = request.query_params.get('start_date')
+        start_date = parse_date(start_date, 'start_date') if start_date else default_start_date(end_date, granularity)
+        if start_date > end_date:
+            raise ValidationError({'start_date': 'Start date must not be after end date.'})
+
+        if len(list(period_starts(start_date, end_date, granularity))) > MAX_PERIODS:
+            raise ValidationError({'start_date': f'The range may cover at most {MAX_PERIODS} periods.'})
+
+        results = time_series(start_date, end_date, granularity)
+        return Response({'granularity': granularity, 'results': results})
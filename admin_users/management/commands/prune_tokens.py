@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired outstanding and blacklisted refresh tokens in small batches. '
+        'Meant to run daily from the scheduler (e.g. Heroku Scheduler: python manage.py prune_tokens).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per transaction.')
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Seconds to sleep between batches, to leave room for concurrent logins and logouts.'
+        )
+
+    def handle(self, *args, **options):
+        # Expired tokens are rejected on their exp claim alone, so they can go from both tables. Each batch is a
+        # short transaction over primary keys, walked in id order so no batch rescans what was already deleted.
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).order_by('id')
+        last_id, outstanding_total, blacklisted_total = 0, 0, 0
+
+        while True:
+            ids = list(expired.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            with transaction.atomic():
+                blacklisted, _ = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                outstanding, _ = OutstandingToken.objects.filter(id__in=ids).delete()
+            blacklisted_total += blacklisted
+            outstanding_total += outstanding
+
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding_total} expired outstanding and {blacklisted_total} blacklisted token(s).'
+        ))
@@ -1,8 +1,12 @@
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
+from shared.serializers import TimedSerializerMixin
+from shared.tokens import StaffRefreshToken
 from shared.utils import token
 
 
@@ -69,13 +73,13 @@ class LogoutStaffUserSerializer(serializers.Serializer):
     refresh_token = serializers.CharField()
 
 
-class ViewStaffUserDataSerializer(serializers.ModelSerializer):
+class ViewStaffUserDataSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         exclude = ['password', 'groups', 'user_permissions']
 
 
-class ChangeStaffUserDataSerializer(serializers.ModelSerializer):
+class ChangeStaffUserDataSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
 
     class Meta:
@@ -102,3 +106,34 @@ class ChangePasswordSerializer(serializers.Serializer):
             validate_password(new_password)
 
         return attrs
+
+
+
+class StaffTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = StaffRefreshToken
+
+
+class StaffTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = StaffRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        # Access tokens are trusted without a user lookup, so their staff claims are taken fresh from here.
+        refresh.set_staff_claims(user)
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        return data
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from shared import revocation
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_revocation_filter(sender, instance, created, **kwargs):
+    # Covers logout, refresh token rotation and the admin alike.
+    if created:
+        transaction.on_commit(revocation.invalidate)
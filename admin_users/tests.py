@@ -1,3 +1,174 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from shared.testing import QueryCountMixin
+from shared.tokens import StaffRefreshToken
+from shared.utils import token
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('staffuser', password='password', is_staff=True)
+
+    def login(self):
+        response = self.client.post('/admin-dashboard/users/login/', {'username': 'staffuser', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def authenticate_request(self, authentication_class, access_token):
+        request = APIView().initialize_request(
+            APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access_token}'))
+        with CaptureQueriesContext(connection) as queries:
+            user, _ = authentication_class().authenticate(request)
+        return user, len(queries)
+
+    def test_stateless_authentication_saves_the_user_query(self):
+        access_token = self.login()['access']
+        user, stateful_queries = self.authenticate_request(JWTAuthentication, access_token)
+        token_user, stateless_queries = self.authenticate_request(JWTStatelessUserAuthentication, access_token)
+
+        self.assertEqual(stateful_queries, 1)
+        self.assertEqual(stateless_queries, 0)
+        self.assertTrue(token_user.is_staff)
+        self.assertFalse(token_user.is_superuser)
+
+    def test_staff_endpoint_runs_no_user_query(self):
+        access_token = token(self.user)['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin-dashboard/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'auth_user' in query['sql']])
+
+    def test_refresh_takes_staff_claims_from_the_database(self):
+        refresh_token = self.login()['refresh']
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+
+        response = self.client.post('/admin-dashboard/users/login/refresh/', {'refresh': refresh_token})
+        self.assertEqual(response.status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get('/admin-dashboard/summary/').status_code, 403)
+
+    def test_refresh_rejects_inactive_users(self):
+        refresh_token = self.login()['refresh']
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.client.post('/admin-dashboard/users/login/refresh/', {'refresh': refresh_token})
+        self.assertEqual(response.status_code, 401)
+
+    def test_profile_views_still_load_the_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()["access"]}')
+        response = self.client.get('/admin-dashboard/users/user/data/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'staffuser')
+
+
+@override_settings(TOKEN_REVOCATION_FILTER=True)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        User.objects.create_user('staffuser', password='password', is_staff=True)
+        self.tokens = self.client.post('/admin-dashboard/users/login/',
+                                       {'username': 'staffuser', 'password': 'password'}).data
+
+    def refresh(self):
+        return self.client.post('/admin-dashboard/users/login/refresh/', {'refresh': self.tokens['refresh']})
+
+    def test_refresh_of_a_live_token_skips_the_blacklist_query(self):
+        self.refresh()  # Loads the filter
+        with CaptureQueriesContext(connection) as queries:
+            response = self.refresh()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'token_blacklist' in query['sql']])
+
+    def test_logged_out_token_can_not_be_refreshed(self):
+        self.refresh()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin-dashboard/users/logout/', {'refresh_token': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh().status_code, 401)
+
+
+class PruneTokensTests(TestCase):
+    def test_deletes_only_expired_tokens(self):
+        now = timezone.now()
+        for index, expires_at in enumerate([now - timedelta(days=1)] * 3 + [now + timedelta(days=1)] * 2):
+            outstanding = OutstandingToken.objects.create(jti=str(index), token='token', expires_at=expires_at)
+            if index % 2 == 0:
+                BlacklistedToken.objects.create(token=outstanding)
+
+        call_command('prune_tokens', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+        self.assertFalse(OutstandingToken.objects.filter(expires_at__lte=now).exists())
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class QueryCountTests(QueryCountMixin, TestCase):
+    """Staff user endpoints run a fixed number of queries, whatever the number of users and issued tokens."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user('staffuser', password='password', is_staff=True)
+
+    def seed(self, count):
+        """Add `count` staff users with an issued and a blacklisted refresh token each."""
+        for _ in range(count):
+            user = User.objects.create_user(f'staffuser{User.objects.count()}', is_staff=True)
+            token(user)
+            StaffRefreshToken.for_user(user).blacklist()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token(user)["access_token"]}')
+
+    def test_login_refresh_and_logout(self):
+        credentials = {'username': 'staffuser', 'password': 'password'}
+        self.assertQueriesIndependentOf(
+            self.seed, lambda size: self.client.post('/admin-dashboard/users/login/', credentials), 2)
+
+        refresh_token = str(StaffRefreshToken.for_user(self.user))
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.post(
+            '/admin-dashboard/users/login/refresh/', {'refresh': refresh_token}), 2)
+
+        self.authenticate(self.user)
+        refresh_tokens = iter([str(StaffRefreshToken.for_user(self.user)) for _ in self.dataset_sizes])
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.post(
+            '/admin-dashboard/users/logout/', {'refresh_token': next(refresh_tokens)}), 6)
+
+    def test_signup(self):
+        self.authenticate(User.objects.create_superuser('superuser', password='password'))
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.post('/admin-dashboard/users/signup/', {
+            'username': f'newstaff{size}', 'email': 'staff@example.com', 'password': 'Secret-pass-123',
+            'confirm_password': 'Secret-pass-123'}), 2)
+
+    def test_own_data(self):
+        self.authenticate(self.user)
+        self.assertQueriesIndependentOf(
+            self.seed, lambda size: self.client.get('/admin-dashboard/users/user/data/'), 1)
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.patch(
+            '/admin-dashboard/users/user/data/change/', {'first_name': f'Staff {size}'}), 2)
+
+        passwords = ['password'] + [f'Secret-pass-{size}' for size in self.dataset_sizes]
+
+        def change_password(size):
+            old_password, new_password = passwords[self.dataset_sizes.index(size):][:2]
+            return self.client.put('/admin-dashboard/users/user/password/change/', {
+                'old_password': old_password, 'new_password': new_password, 'confirm_new_password': new_password})
+
+        self.assertQueriesIndependentOf(self.seed, change_password, 2)
@@ -1,19 +1,30 @@
 from rest_framework import status
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.contrib.auth.models import User
 
 from shared.permissions import IsStaffUser, IsSuperUser
+from shared.tokens import StaffRefreshToken
 from .serializers import (SignUpStaffUserSerializer, LogoutStaffUserSerializer, ChangeStaffUserDataSerializer,
                           ViewStaffUserDataSerializer, ChangePasswordSerializer)
 
 
+class CurrentUserMixin:
+    """Loads the requesting User row, since requests are authenticated from the token claims alone."""
+
+    def get_object(self):
+        user = User.objects.filter(pk=self.request.user.id, is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        return user
+
+
 @extend_schema(
         request=SignUpStaffUserSerializer,
         tags=['staff users authentication'],
@@ -40,7 +51,7 @@ class LogoutStaffUserAPIView(generics.CreateAPIView):
 
         try:
             refresh_token = serializer.validated_data.get('refresh_token')
-            refresh = RefreshToken(refresh_token)
+            refresh = StaffRefreshToken(refresh_token)
             refresh.blacklist()
             return Response(
                 {
@@ -64,13 +75,10 @@ class LogoutStaffUserAPIView(generics.CreateAPIView):
         Profile data. You can only see your own data.
         """
     )
-class ViewStaffUserDataAPIView(generics.RetrieveAPIView):
+class ViewStaffUserDataAPIView(CurrentUserMixin, generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
     serializer_class = ViewStaffUserDataSerializer
 
-    def get_object(self):
-        return self.request.user
-
 
 @extend_schema(
         request=ChangeStaffUserDataSerializer,
@@ -79,14 +87,11 @@ class ViewStaffUserDataAPIView(generics.RetrieveAPIView):
         Update profile data. You can only update your first name, last name, email
         """
     )
-class ChangeStaffUserDataAPIView(generics.UpdateAPIView):
+class ChangeStaffUserDataAPIView(CurrentUserMixin, generics.UpdateAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
     serializer_class = ChangeStaffUserDataSerializer
     http_method_names = ['patch', 'put']
 
-    def get_object(self):
-        return self.request.user
-
 
 @extend_schema(
         request=ChangePasswordSerializer,
@@ -95,7 +100,7 @@ class ChangeStaffUserDataAPIView(generics.UpdateAPIView):
         Change staff user password.
         """
     )
-class ChangePasswordAPIView(generics.UpdateAPIView):
+class ChangePasswordAPIView(CurrentUserMixin, generics.UpdateAPIView):
     permission_classes = [IsAuthenticated, IsStaffUser]
     serializer_class = ChangePasswordSerializer
     http_method_names = ['put']
@@ -104,7 +109,7 @@ class ChangePasswordAPIView(generics.UpdateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = request.user
+        user = self.get_object()
         old_password = serializer.validated_data.get('old_password')
         new_password = serializer.validated_data.get('new_password')
 
@@ -0,0 +1,68 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+
+from main.models import Sponsor
+from shared.benchmark import run_concurrently
+
+
+BENCH_PREFIX = 'bench-applications'
+
+
+class Command(BaseCommand):
+    help = ('Submit sponsor applications to sponsors/apply from many threads, part of them resubmissions of an '
+            'earlier application with the phone number written differently. Report submissions per minute and '
+            'verify no phone number ended up with two open applications.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--applications', type=int, default=3000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duplicates', type=float, default=0.2, help='Share of resubmissions.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the submitted applications after the run.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                f'{connection.vendor} serializes all writes; the run only shows single-writer behaviour.'))
+
+        rng = random.Random(options['seed'])
+        phone_numbers = [f'9{rng.randrange(10 ** 8):08d}' for _ in range(options['applications'])]
+        for i in range(1, len(phone_numbers)):
+            if rng.random() < options['duplicates']:
+                phone_numbers[i] = phone_numbers[rng.randrange(i)]
+        written = [rng.choice(self.spellings(phone_number)) for phone_number in phone_numbers]
+
+        def task(i):
+            data = {
+                'sponsor_type': 'individual', 'full_name': f'{BENCH_PREFIX}-{i}', 'payment_type': 'cash',
+                'phone_number': written[i], 'total_sponsorship_amount': 1000000
+            }
+            return Client(SERVER_NAME='localhost').post('/sponsors/apply', data).status_code
+
+        try:
+            result = run_concurrently(task, options['applications'], options['concurrency'])
+            duplicated = list(Sponsor.objects.open_applications().filter(full_name__startswith=BENCH_PREFIX).values(
+                'phone_number').annotate(count=Count('id')).filter(count__gt=1).values_list('phone_number', flat=True))
+        finally:
+            if not options['keep']:
+                Sponsor.objects.filter(full_name__startswith=BENCH_PREFIX).delete()
+
+        summary = result.summary()
+        summary['applications_per_min'] = round(result.throughput * 60)
+        summary['unique_phone_numbers'] = len(set(phone_numbers))
+        summary['duplicated_phone_numbers'] = len(duplicated)
+        self.stdout.write(json.dumps(summary, indent=2))
+
+        if duplicated:
+            raise CommandError(f'{len(duplicated)} phone number(s) have more than one open application.')
+        self.stdout.write(self.style.SUCCESS('No duplicate open applications.'))
+
+    @staticmethod
+    def spellings(number):
+        """Ways people write the same local nine digit number."""
+        return f'+998{number}', f'998{number}', number, f'+998 ({number[:2]}) {number[2:5]}-{number[5:7]}-{number[7:]}'
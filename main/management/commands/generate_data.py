@@ -0,0 +1,169 @@
+import random
+import time
+import uuid
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from admin_dashboard.analytics import forget_period
+from admin_dashboard.models import DashboardSummary
+from main.models import (
+    Sponsor, Student, StudentSponsor, INDIVIDUAL, LEGAL_ENTITY, CASH, DEBIT_CARD, BANK_TRANSFER, NEW, IN_PROGRESS,
+    VERIFIED, CANCELLED, BACHELOR, MASTER
+)
+
+
+FIRST_NAMES = ('Aziz', 'Bekzod', 'Dilnoza', 'Farrux', 'Gulnora', 'Jasur', 'Kamola', 'Laziz', 'Madina', 'Nodir',
+               'Otabek', 'Rustam', 'Sardor', 'Shahlo', 'Timur', 'Umida', 'Xurshid', 'Yulduz', 'Zarina', 'Sherzod')
+LAST_NAMES = ('Karimov', 'Rahimova', 'Toshmatov', 'Yusupova', 'Aliyev', 'Saidova', 'Ergashev', 'Qodirova',
+              'Nazarov', 'Abdullayeva', 'Mirzayev', 'Xolmatova', 'Ismoilov', 'Sobirova', 'Usmonov')
+UNIVERSITIES = ('TATU', 'UzMU', 'TDIU', 'WIUT', 'INHA', 'TDTU', 'SamDU', 'TDPU', 'TMA', 'Westminster')
+TUITION_FEES = (4000000, 5000000, 6500000, 8000000, 12000000, 18000000, 25000000)
+SPONSORSHIP_AMOUNTS = (10000000, 30000000, 50000000, 100000000, 300000000, 500000000)
+ALLOCATION_AMOUNTS = (100000, 250000, 500000, 1000000, 1500000, 2000000)
+STATUSES, STATUS_WEIGHTS = (NEW, IN_PROGRESS, VERIFIED, CANCELLED), (10, 10, 75, 5)
+PAYMENT_TYPES = (CASH, DEBIT_CARD, BANK_TRANSFER)
+
+
+@contextmanager
+def keep_timestamps(*models):
+    """Let bulk_create() store the generated created_at/updated_at instead of now()."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with synthetic sponsors, students and allocations for load testing. '
+            'The same --seed and --until on an empty database always produce the same rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200000)
+        parser.add_argument('--sponsors', type=int, default=20000)
+        parser.add_argument('--allocations', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=730, help='Spread created_at over this many days.')
+        parser.add_argument('--until', type=datetime.fromisoformat, default=None,
+                            help='Newest created_at (YYYY-MM-DD); today by default.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        until = options['until'] or datetime.combine(timezone.localdate(), datetime.min.time())
+        end = timezone.make_aware(until) if timezone.is_naive(until) else until
+        start = end - timedelta(days=options['days'])
+        span = (end - start).total_seconds()
+        started = time.perf_counter()
+
+        # Plan everything in flat arrays first: allocated_total of every row must be known before it is inserted.
+        sponsors = self.plan_parties(rng, options['sponsors'], span)
+        students = self.plan_parties(rng, options['students'], span)
+        sponsor_limits = array('d', (rng.choice(SPONSORSHIP_AMOUNTS) for _ in range(options['sponsors'])))
+        student_limits = array('d', (rng.choice(TUITION_FEES) for _ in range(options['students'])))
+        sponsor_statuses = rng.choices(STATUSES, STATUS_WEIGHTS, k=options['sponsors'])
+        verified = [i for i, status in enumerate(sponsor_statuses) if status == VERIFIED]
+        allocations = self.plan_allocations(rng, options['allocations'], verified, options['students'],
+                                            sponsor_limits, student_limits, sponsors, students, span)
+
+        batch_size = options['batch_size']
+        with keep_timestamps(Sponsor, Student, StudentSponsor), transaction.atomic():
+            self.insert(Sponsor, batch_size, (
+                self.sponsor(rng, i, sponsors, sponsor_limits[i], sponsor_statuses[i], start)
+                for i in range(options['sponsors'])))
+            self.insert(Student, batch_size, (
+                self.student(rng, i, students, student_limits[i], start) for i in range(options['students'])))
+            self.insert(StudentSponsor, batch_size, (
+                StudentSponsor(sponsor_id=sponsors['ids'][sponsor], student_id=students['ids'][student],
+                               allocated_money=money, created_at=start + timedelta(seconds=created),
+                               updated_at=start + timedelta(seconds=created))
+                for sponsor, student, money, created in zip(*allocations)))
+
+        DashboardSummary.rebuild()
+        day = start
+        while day <= end:
+            forget_period(day)  # Cached analytics of closed periods no longer hold
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["sponsors"]} sponsors, {options["students"]} students and '
+            f'{len(allocations[0])} allocations in {time.perf_counter() - started:.1f}s.'))
+
+    @staticmethod
+    def plan_parties(rng, count, span):
+        return {
+            'ids': [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(count)],
+            'created': array('d', (rng.random() * span for _ in range(count))),  # Seconds after start
+            'allocated': array('d', bytes(8 * count)),
+        }
+
+    @staticmethod
+    def plan_allocations(rng, count, verified, student_count, sponsor_limits, student_limits, sponsors, students,
+                         span):
+        """
+        Pick up to `count` (sponsor, student, money, created) allocations that keep every sponsor and student
+        within its limit. Gives up early when the verified sponsors or the tuition fees run out of room.
+        """
+        planned = array('l'), array('l'), array('d'), array('d')
+        misses = 0
+        while len(planned[0]) < count and verified and misses < 1000:
+            sponsor, student = rng.choice(verified), rng.randrange(student_count)
+            money = min(rng.choice(ALLOCATION_AMOUNTS), sponsor_limits[sponsor] - sponsors['allocated'][sponsor],
+                        student_limits[student] - students['allocated'][student])
+            if money <= 0:
+                misses += 1
+                continue
+            misses = 0
+            sponsors['allocated'][sponsor] += money
+            students['allocated'][student] += money
+            earliest = max(sponsors['created'][sponsor], students['created'][student])
+            for values, value in zip(planned, (sponsor, student, money, earliest + rng.random() * (span - earliest))):
+                values.append(value)
+        return planned
+
+    @staticmethod
+    def full_name(rng):
+        return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+    @staticmethod
+    def phone_number(rng):
+        return f'+99890{rng.randrange(10 ** 7):07d}'
+
+    def sponsor(self, rng, i, sponsors, limit, status, start):
+        sponsor_type = rng.choice((INDIVIDUAL, INDIVIDUAL, LEGAL_ENTITY))
+        created_at = start + timedelta(seconds=sponsors['created'][i])
+        return Sponsor(
+            id=sponsors['ids'][i], sponsor_type=sponsor_type, full_name=self.full_name(rng),
+            phone_number=self.phone_number(rng), payment_type=rng.choice(PAYMENT_TYPES),
+            total_sponsorship_amount=limit, status=status, allocated_total=sponsors['allocated'][i],
+            company_name=f'{rng.choice(LAST_NAMES)} Group' if sponsor_type == LEGAL_ENTITY else None,
+            created_at=created_at, updated_at=created_at
+        )
+
+    def student(self, rng, i, students, limit, start):
+        created_at = start + timedelta(seconds=students['created'][i])
+        return Student(
+            id=students['ids'][i], full_name=self.full_name(rng), phone_number=self.phone_number(rng),
+            university=rng.choice(UNIVERSITIES), degree=rng.choice((BACHELOR, BACHELOR, MASTER)), tuition_fee=limit,
+            allocated_total=students['allocated'][i], created_at=created_at, updated_at=created_at
+        )
+
+    def insert(self, model, batch_size, rows):
+        batch, inserted = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                model.objects.bulk_create(batch)
+                inserted, batch = inserted + len(batch), []
+        model.objects.bulk_create(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {inserted + len(batch)} inserted')
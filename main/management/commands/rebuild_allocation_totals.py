@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value, FloatField
+from django.db.models.functions import Abs, Coalesce, Now
+
+from main.models import Sponsor, Student, StudentSponsor
+from shared.utils import MONEY_TOLERANCE
+
+
+class Command(BaseCommand):
+    help = 'Check and rebuild the denormalized allocated_total columns on sponsors and students.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report rows whose allocated_total drifted; exit with an error if any did.'
+        )
+
+    @staticmethod
+    def actual_totals(field_name):
+        totals = StudentSponsor.objects.filter(**{field_name: OuterRef('pk')}).values(field_name).annotate(
+            total=Sum('allocated_money')).values('total')
+        return Coalesce(Subquery(totals), Value(0.0), output_field=FloatField())
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for model, field_name in ((Sponsor, 'sponsor'), (Student, 'student')):
+            with transaction.atomic():
+                drift = model.objects.annotate(actual=self.actual_totals(field_name)).annotate(
+                    drift=Abs(F('allocated_total') - F('actual'))).filter(drift__gt=MONEY_TOLERANCE)
+                count = drift.count()
+                drifted += count
+                self.stdout.write(f'{model._meta.verbose_name_plural}: {count} row(s) out of sync')
+
+                if not options['check']:
+                    # Only touch drifted rows so updated_at (and the HTTP validators built on it) stays put elsewhere.
+                    model.objects.filter(pk__in=drift.values('pk')).update(
+                        allocated_total=self.actual_totals(field_name), updated_at=Now())
+                    self.stdout.write(self.style.SUCCESS(f'{model._meta.verbose_name_plural}: rebuilt'))
+
+        if options['check'] and drifted:
+            raise CommandError(f'{drifted} row(s) have a drifted allocated_total.')
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2025-03-04 10:12
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value, FloatField
+from django.db.models.functions import Coalesce
+
+
+def populate_allocated_totals(apps, schema_editor):
+    StudentSponsor = apps.get_model('main', 'StudentSponsor')
+    for model_name, field_name in (('Sponsor', 'sponsor'), ('Student', 'student')):
+        model = apps.get_model('main', model_name)
+        totals = StudentSponsor.objects.filter(**{field_name: OuterRef('pk')}).values(field_name).annotate(
+            total=Sum('allocated_money')).values('total')
+        model.objects.update(
+            allocated_total=Coalesce(Subquery(totals), Value(0.0), output_field=FloatField())
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sponsor',
+            name='allocated_total',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='allocated_total',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_allocated_totals, migrations.RunPython.noop),
+    ]
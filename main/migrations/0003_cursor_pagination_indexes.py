@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2025-03-06 14:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_allocated_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsponsor',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='sponsor',
+            index=models.Index(fields=['created_at', 'id'], name='sponsors_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['created_at', 'id'], name='students_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentsponsor',
+            index=models.Index(fields=['student', 'created_at', 'id'], name='student_sponsors_created_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2025-03-12 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sponsor',
+            index=models.Index(fields=['status', 'created_at'], name='sponsors_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sponsor',
+            index=models.Index(fields=['status', 'total_sponsorship_amount'], name='sponsors_status_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['degree', 'created_at'], name='students_degree_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2025-03-14 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsponsor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2025-03-18 11:30
+
+import re
+
+from django.db import migrations, models
+
+
+def normalize_phone_number(phone_number):
+    # A copy of shared.utils.normalize_phone_number as of this migration, so later changes to it don't change
+    # what this migration does.
+    value = re.sub(r'[\s().-]', '', phone_number or '')
+    if value.startswith('00'):
+        value = '+' + value[2:]
+    if re.fullmatch(r'\d{9}', value):
+        value = '+998' + value
+    elif re.fullmatch(r'998\d{9}', value):
+        value = '+' + value
+    return value if re.fullmatch(r'\+\d{7,12}', value) else None
+
+
+def normalize_phone_numbers(apps, schema_editor):
+    # Applications are checked for duplicates by their normalized phone number; bring existing rows in line.
+    Sponsor = apps.get_model('main', 'Sponsor')
+    for sponsor_id, phone_number in Sponsor.objects.values_list('id', 'phone_number').iterator():
+        normalized = normalize_phone_number(phone_number)
+        if normalized and normalized != phone_number:
+            Sponsor.objects.filter(id=sponsor_id).update(phone_number=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_studentsponsor_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_phone_numbers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sponsor',
+            index=models.Index(condition=models.Q(('status__in', ('new', 'in_progress'))), fields=['phone_number'], name='sponsors_open_phone_idx'),
+        ),
+    ]
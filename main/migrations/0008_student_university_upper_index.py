@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2025-03-20 10:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_sponsor_application_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('university'), name='students_university_upper_idx'),
+        ),
+    ]
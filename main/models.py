@@ -1,5 +1,7 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Upper
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 from shared.models import BaseModel
@@ -8,7 +10,46 @@ from django.core.validators import MinValueValidator
 
 
 BACHELOR, MASTER = 'bachelor', 'master'
-class Student(BaseModel):
+UNFUNDED, PARTIAL, FULL = 'unfunded', 'partial', 'full'
+
+
+class AllocatedTotalModel(BaseModel):
+    # Sum of StudentSponsor.allocated_money for this row, maintained by StudentSponsor.save() and deletes.
+    allocated_total = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Never write allocated_total back from a possibly stale instance; only StudentSponsor changes it.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'allocated_total'
+            ]
+        super(AllocatedTotalModel, self).save(*args, **kwargs)
+
+
+class StudentQuerySet(models.QuerySet):
+    def with_funding(self):
+        """Annotate covered_tuition_fee and remaining_tuition_fee so they can be filtered in the database."""
+        return self.annotate(
+            covered_tuition_fee=F('allocated_total'),
+            remaining_tuition_fee=F('tuition_fee') - F('allocated_total')
+        )
+
+    def funding(self, state):
+        """Filter a with_funding() queryset by funding state (unfunded, partial or full)."""
+        if state == UNFUNDED:
+            return self.filter(covered_tuition_fee__lte=0)
+        if state == PARTIAL:
+            return self.filter(covered_tuition_fee__gt=0, remaining_tuition_fee__gt=0)
+        if state == FULL:
+            return self.filter(remaining_tuition_fee__lte=0)
+        raise ValueError(f'Unknown funding state: {state}')
+
+
+class Student(AllocatedTotalModel):
     DEGREES = (
         (BACHELOR, _("Bachelor's degree")),
         (MASTER, _("Master's degree"))
@@ -20,11 +61,25 @@ class Student(BaseModel):
     degree = models.CharField(max_length=10, choices=DEGREES)
     tuition_fee = models.FloatField()
 
+    objects = StudentQuerySet.as_manager()
+
     class Meta:
         db_table = 'students'
         verbose_name = 'Student'
         verbose_name_plural = 'Students'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='students_created_at_id_idx'),  # Cursor pagination key
+            models.Index(fields=['degree', 'created_at'], name='students_degree_created_idx'),
+            # The university filter is case-insensitive: university__iexact compiles to UPPER("university")
+            models.Index(Upper('university'), name='students_university_upper_idx'),
+        ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Student, cls).from_db(db, field_names, values)
+        # The dashboard summary moves total asked amount by the change in tuition fee on save.
+        instance._stored_tuition_fee = instance.__dict__.get('tuition_fee')
+        return instance
 
     def __str__(self):
         return self.full_name
@@ -33,7 +88,22 @@ class Student(BaseModel):
 INDIVIDUAL, LEGAL_ENTITY = 'individual', 'legal_entity'
 CASH, DEBIT_CARD, BANK_TRANSFER = 'cash', 'debit_card', 'bank_transfer'
 NEW, IN_PROGRESS, VERIFIED, CANCELLED = 'new', 'in_progress', 'verified', 'cancelled'
-class Sponsor(BaseModel):
+OPEN_STATUSES = (NEW, IN_PROGRESS)  # Applications still being processed
+
+
+class SponsorQuerySet(models.QuerySet):
+    def with_funds(self):
+        """Annotate money_spent and available_funds so serializers do not aggregate per row."""
+        return self.annotate(
+            money_spent=F('allocated_total'),
+            available_funds=F('total_sponsorship_amount') - F('allocated_total')
+        )
+
+    def open_applications(self):
+        return self.filter(status__in=OPEN_STATUSES)  # Matches the condition of sponsors_open_phone_idx
+
+
+class Sponsor(AllocatedTotalModel):
     SPONSOR_TYPES = (
         (INDIVIDUAL, _("Individual")),  # Jismoniy shaxs
         (LEGAL_ENTITY, _("Legal Entity"))  # Yuridik shaxs
@@ -59,10 +129,20 @@ class Sponsor(BaseModel):
     company_name = models.CharField(max_length=150, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
 
+    objects = SponsorQuerySet.as_manager()
+
     class Meta:
         db_table = 'sponsors'
         verbose_name = "Sponsor"
         verbose_name_plural = 'Sponsors'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='sponsors_created_at_id_idx'),  # Cursor pagination key
+            models.Index(fields=['status', 'created_at'], name='sponsors_status_created_idx'),
+            models.Index(fields=['status', 'total_sponsorship_amount'], name='sponsors_status_amount_idx'),
+            # Duplicate check of sponsor applications; closed applications never need it.
+            models.Index(fields=['phone_number'], condition=models.Q(status__in=OPEN_STATUSES),
+                         name='sponsors_open_phone_idx'),
+        ]
 
     def clean(self):
         if self.sponsor_type == LEGAL_ENTITY and not self.company_name:
@@ -70,8 +150,10 @@ class Sponsor(BaseModel):
         if self.sponsor_type == INDIVIDUAL and self.company_name:
             raise ValidationError({'message': 'Individuals should not have company name.'})
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
+    def save(self, *args, validate=True, **kwargs):
+        # validate=False is for callers that already validated the data, e.g. with a ModelSerializer.
+        if validate:
+            self.full_clean()
         super(Sponsor, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -83,53 +165,103 @@ class StudentSponsor(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     sponsor = models.ForeignKey(Sponsor, on_delete=models.CASCADE)
     allocated_money = models.FloatField(null=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'student_sponsors'
         verbose_name = 'Student sponsor'
         verbose_name_plural = 'Student sponsors'
+        indexes = [
+            # Lists are always per student, so the cursor pagination key leads with it.
+            models.Index(fields=['student', 'created_at', 'id'], name='student_sponsors_created_idx'),
+        ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(StudentSponsor, cls).from_db(db, field_names, values)
+        if not instance.get_deferred_fields():
+            instance._stored = instance._current_allocation()  # What allocated_total currently accounts for
+        return instance
 
-    def clean(self):
-        total_allocated_money_by_sponsor = StudentSponsor.objects.filter(
-            sponsor=self.sponsor).exclude(id=self.id).aggregate(total=Sum('allocated_money')
-                                                                )['total'] or 0
-        remaining_sponsorship_money = self.sponsor.total_sponsorship_amount - total_allocated_money_by_sponsor
+    def _current_allocation(self):
+        return self.sponsor_id, self.student_id, self.allocated_money
 
-        total_allocated_money_for_student = StudentSponsor.objects.filter(
-            student=self.student).exclude(id=self.id).aggregate(total=Sum('allocated_money')
-                                                                )['total'] or 0
-        remaining_tuition_fee = self.student.tuition_fee - total_allocated_money_for_student
+    def _stored_allocation(self):
+        return getattr(self, '_stored', None)
 
-        if self.sponsor.status != VERIFIED:
-            raise ValidationError(
-                {
-                    'success': False,
-                    'message': 'Unverified sponsor can not allocate money.'
-                }
-            )
+    def _stored_amount_for(self, sponsor_id=None, student_id=None):
+        stored = self._stored_allocation()
+        if not stored:
+            return 0
+        stored_sponsor_id, stored_student_id, stored_money = stored
+        if sponsor_id is not None and sponsor_id != stored_sponsor_id:
+            return 0
+        if student_id is not None and student_id != stored_student_id:
+            return 0
+        return stored_money
 
-        if remaining_sponsorship_money < self.allocated_money:
-            raise ValidationError(
-                {
-                    'success': False,
-                    'message': 'Sponsor does not have enough funds available.'
-                }
-            )
+    @staticmethod
+    def allocation_error(sponsor, student, allocated_money, sponsor_allocated, student_allocated):
+        """Return why allocated_money can not go from sponsor to student, or None when it can."""
+        if sponsor.status != VERIFIED:
+            return 'Unverified sponsor can not allocate money.'
 
-        if remaining_tuition_fee < self.allocated_money:
+        if sponsor.total_sponsorship_amount - sponsor_allocated < allocated_money:
+            return 'Sponsor does not have enough funds available.'
+
+        if student.tuition_fee - student_allocated < allocated_money:
+            return 'Allocated money exceeds remaining tuition fee.'
+
+        return None
+
+    def clean(self):
+        total_allocated_money_by_sponsor = (self.sponsor.allocated_total
+                                            - self._stored_amount_for(sponsor_id=self.sponsor_id))
+        total_allocated_money_for_student = (self.student.allocated_total
+                                             - self._stored_amount_for(student_id=self.student_id))
+
+        message = self.allocation_error(self.sponsor, self.student, self.allocated_money,
+                                        total_allocated_money_by_sponsor, total_allocated_money_for_student)
+        if message:
             raise ValidationError(
                 {
                     'success': False,
-                    'message': 'Allocated money exceeds remaining tuition fee.'
+                    'message': message
                 }
             )
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super(StudentSponsor, self).save(*args, **kwargs)
+    def save(self, *args, validate=True, **kwargs):
+        # validate=False is for callers that already ran clean() against rows they hold locked, e.g. allocate().
+        if validate:
+            self.full_clean()
+        with transaction.atomic():
+            super(StudentSponsor, self).save(*args, **kwargs)
+            self._apply_allocated_totals(self._stored_allocation(), self._current_allocation())
+        self._stored = self._current_allocation()
 
-    def __str__(self):
-        return f"Student {self.student.full_name} - Sponsor {self.sponsor.full_name}"
+    def _apply_allocated_totals(self, old, new):
+        """Move allocated_total on Sponsor and Student from the old allocation to the new one."""
+        sponsor_deltas, student_deltas = {}, {}
+        for allocation, sign in ((old, -1), (new, 1)):
+            if allocation:
+                sponsor_id, student_id, money = allocation
+                sponsor_deltas[sponsor_id] = sponsor_deltas.get(sponsor_id, 0) + sign * money
+                student_deltas[student_id] = student_deltas.get(student_id, 0) + sign * money
 
+        for model, deltas, cached_name in ((Sponsor, sponsor_deltas, 'sponsor'), (Student, student_deltas, 'student')):
+            cached = self._state.fields_cache.get(cached_name)
+            # In primary key order, as admin_dashboard.services.lock_rows() locks them, so moving an allocation
+            # to another sponsor or student can't take the two row locks in the opposite order of a concurrent one.
+            for pk, delta in sorted(deltas.items()):
+                if not delta:
+                    continue
+                # update() skips auto_now, so updated_at is bumped here to keep conditional GETs honest.
+                updated_at = timezone.now()
+                model.objects.filter(pk=pk).update(allocated_total=F('allocated_total') + delta, updated_at=updated_at)
+                if cached is not None and cached.pk == pk:
+                    cached.allocated_total += delta
+                    cached.updated_at = updated_at
 
+    def __str__(self):
+        return f"Student {self.student.full_name} - Sponsor {self.sponsor.full_name}"
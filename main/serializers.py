@@ -1,17 +1,27 @@
+from django.db import transaction
 from rest_framework.exceptions import ValidationError
 
+from shared.serializers import TimedSerializerMixin
+from shared.utils import advisory_lock, normalize_phone_number
 from .models import StudentSponsor, Student, Sponsor
 from rest_framework import serializers
 from .models import LEGAL_ENTITY, INDIVIDUAL
 
 
-class SponsorApplicationSerializer(serializers.ModelSerializer):
+class SponsorApplicationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
+    phone_number = serializers.CharField(max_length=32)  # Spaces, dashes and brackets are normalized away
 
     class Meta:
         model = Sponsor
         fields = ['id', 'sponsor_type', 'full_name', 'phone_number', 'payment_type', 'total_sponsorship_amount', 'company_name', 'description']
 
+    def validate_phone_number(self, value):
+        phone_number = normalize_phone_number(value)
+        if phone_number is None:
+            raise ValidationError('Enter a valid phone number, e.g. +998901234567.')
+        return phone_number
+
     def validate(self, attrs):
         sponsor_type = attrs.get('sponsor_type')
         company_name = attrs.get('company_name')
@@ -33,3 +43,20 @@ class SponsorApplicationSerializer(serializers.ModelSerializer):
             )
 
         return attrs
+
+    def create(self, validated_data):
+        phone_number = validated_data['phone_number']
+        with transaction.atomic():
+            # Resubmissions of the same application may arrive at the same time; queue them per phone number.
+            advisory_lock(f'sponsor-application:{phone_number}')
+            sponsor = Sponsor(**validated_data)
+            sponsor.save(validate=False)  # Sponsor.clean() rules are checked in validate() above
+            # Checked after the insert, so SQLite takes its write lock first instead of failing to upgrade a read.
+            if Sponsor.objects.open_applications().filter(phone_number=phone_number).exclude(id=sponsor.id).exists():
+                raise ValidationError(
+                    {
+                        'success': False,
+                        'message': 'An application with this phone number is already being processed.'
+                    }
+                )
+        return sponsor
@@ -0,0 +1,11 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import StudentSponsor
+
+
+@receiver(pre_delete, sender=StudentSponsor)
+def release_allocated_totals(sender, instance, **kwargs):
+    # Runs for instance.delete(), queryset deletes and cascades from Student or Sponsor alike.
+    stored = instance._stored_allocation() or instance._current_allocation()
+    instance._apply_allocated_totals(stored, None)
@@ -1,3 +1,158 @@
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F, Q, Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from admin_dashboard.models import DashboardSummary
+from shared.testing import QueryCountMixin
+
+from .models import Sponsor, Student, StudentSponsor, VERIFIED
+
+
+class QueryCountTests(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def seed(self, count):
+        Sponsor.objects.bulk_create(
+            Sponsor(sponsor_type='individual', full_name='Sponsor', phone_number='+998901234567', payment_type='cash',
+                    total_sponsorship_amount=1000000) for _ in range(count)
+        )
+
+    def test_sponsor_application(self):
+        data = {'sponsor_type': 'individual', 'full_name': 'Sponsor', 'payment_type': 'cash',
+                'total_sponsorship_amount': 1000000}
+        self.assertQueriesIndependentOf(self.seed, lambda size: self.client.post(
+            '/sponsors/apply', {**data, 'phone_number': f'+99899{size:07d}'}), 4)
+
+
+class SponsorApplicationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.data = {'sponsor_type': 'individual', 'full_name': 'Sponsor', 'phone_number': '+998 (90) 123-45-67',
+                     'payment_type': 'cash', 'total_sponsorship_amount': 1000000}
+
+    def test_phone_number_is_normalized(self):
+        response = self.client.post('/sponsors/apply', self.data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sponsor.objects.get().phone_number, '+998901234567')
+
+        self.data['phone_number'] = '12-34'
+        self.assertEqual(self.client.post('/sponsors/apply', self.data).status_code, 400)
+
+    def test_resubmission_is_rejected_while_the_application_is_open(self):
+        self.assertEqual(self.client.post('/sponsors/apply', self.data).status_code, 201)
+        self.data['phone_number'] = '901234567'
+        response = self.client.post('/sponsors/apply', self.data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'An application with this phone number is already being processed.')
+        self.assertEqual(Sponsor.objects.count(), 1)
+
+        Sponsor.objects.update(status=VERIFIED)
+        self.assertEqual(self.client.post('/sponsors/apply', self.data).status_code, 201)
+
+    def test_model_validation_runs_once(self):
+        with mock.patch.object(Sponsor, 'full_clean') as full_clean:
+            self.assertEqual(self.client.post('/sponsors/apply', self.data).status_code, 201)
+        full_clean.assert_not_called()
+
+
+class AllocatedTotalTests(TestCase):
+    def setUp(self):
+        self.sponsors = sorted((Sponsor.objects.create(
+            sponsor_type='individual', full_name=f'Sponsor {i}', phone_number='+998901234567', payment_type='cash',
+            total_sponsorship_amount=1000000, status=VERIFIED) for i in range(2)), key=lambda sponsor: sponsor.pk)
+        self.student = Student.objects.create(full_name='Student', phone_number='+998901234567', university='TATU',
+                                              degree='bachelor', tuition_fee=5000000)
+
+    def test_moving_an_allocation_updates_rows_in_primary_key_order(self):
+        for old, new in ((1, 0), (0, 1)):
+            allocation = StudentSponsor.objects.create(sponsor=self.sponsors[old], student=self.student,
+                                                       allocated_money=1000)
+            allocation = StudentSponsor.objects.get(pk=allocation.pk)
+            allocation.sponsor = self.sponsors[new]
+            with CaptureQueriesContext(connection) as queries:
+                allocation.save()
+            updated = [sponsor.pk for query in queries if query['sql'].startswith('UPDATE "sponsors"')
+                       for sponsor in self.sponsors if sponsor.pk.hex in query['sql']]
+            self.assertEqual(updated, [sponsor.pk for sponsor in self.sponsors])
+            allocation.delete()
+
+    def allocate(self, sponsor, allocated_money):
+        return StudentSponsor.objects.create(sponsor=sponsor, student=self.student, allocated_money=allocated_money)
+
+    def allocated_totals(self):
+        return ([sponsor.allocated_total for sponsor in Sponsor.objects.order_by('pk')],
+                Student.objects.get(pk=self.student.pk).allocated_total)
+
+    def test_deleting_allocations_releases_their_money(self):
+        allocation = self.allocate(self.sponsors[0], 1000)
+        self.allocate(self.sponsors[0], 2000)
+        self.allocate(self.sponsors[1], 4000)
+        self.assertEqual(self.allocated_totals(), ([3000, 4000], 7000))
+
+        allocation.delete()
+        self.assertEqual(self.allocated_totals(), ([2000, 4000], 6000))
+
+        StudentSponsor.objects.filter(sponsor=self.sponsors[0]).delete()
+        self.assertEqual(self.allocated_totals(), ([0, 4000], 4000))
+
+    def test_cascading_deletes_release_allocated_money(self):
+        self.allocate(self.sponsors[0], 1000)
+        self.allocate(self.sponsors[1], 4000)
+
+        self.sponsors[1].delete()  # Cascades to its allocation
+        self.assertEqual(self.allocated_totals(), ([1000], 1000))
+
+        self.student.delete()
+        self.assertEqual(Sponsor.objects.get(pk=self.sponsors[0].pk).allocated_total, 0)
+
+    def test_rebuild_allocation_totals_repairs_drifted_rows(self):
+        self.allocate(self.sponsors[0], 1000)
+        self.allocate(self.sponsors[1], 4000)
+        Sponsor.objects.filter(pk=self.sponsors[0].pk).update(allocated_total=1500)
+        Student.objects.filter(pk=self.student.pk).update(allocated_total=0)
+
+        output = StringIO()
+        with self.assertRaisesMessage(CommandError, '2 row(s) have a drifted allocated_total.'):
+            call_command('rebuild_allocation_totals', '--check', stdout=output)
+        self.assertIn('Sponsors: 1 row(s) out of sync', output.getvalue())
+        self.assertIn('Students: 1 row(s) out of sync', output.getvalue())
+        self.assertEqual(self.allocated_totals(), ([1500, 4000], 0))  # --check only reports
+
+        call_command('rebuild_allocation_totals', stdout=StringIO())
+        self.assertEqual(self.allocated_totals(), ([1000, 4000], 5000))
+        call_command('rebuild_allocation_totals', '--check', stdout=StringIO())
+
+
+class GenerateDataTests(TestCase):
+    def generate(self, seed):
+        call_command('generate_data', sponsors=10, students=50, allocations=200, seed=seed, until=datetime(2026, 1, 1),
+                     stdout=StringIO())
+        return list(StudentSponsor.objects.order_by('id').values_list('sponsor_id', 'student_id', 'allocated_money',
+                                                                       'created_at'))
+
+    def test_totals_match_the_allocations(self):
+        self.generate(seed=1)
+        self.assertEqual((Sponsor.objects.count(), Student.objects.count()), (10, 50))
+        for model, limit in ((Sponsor, 'total_sponsorship_amount'), (Student, 'tuition_fee')):
+            for row in model.objects.annotate(actual=Sum('studentsponsor__allocated_money')):
+                self.assertAlmostEqual(row.allocated_total, row.actual or 0)
+                self.assertLessEqual(row.allocated_total, getattr(row, limit))
+        self.assertEqual(DashboardSummary.load().to_dict(), DashboardSummary(**DashboardSummary.live_totals()).to_dict())
+        self.assertFalse(StudentSponsor.objects.filter(
+            Q(created_at__lt=F('sponsor__created_at')) | Q(created_at__lt=F('student__created_at'))).exists())
 
-# Create your tests here.
+    def test_same_seed_generates_the_same_rows(self):
+        first = self.generate(seed=1)
+        StudentSponsor.objects.all().delete()
+        Sponsor.objects.all().delete()
+        Student.objects.all().delete()
+        self.assertEqual(self.generate(seed=1), first)
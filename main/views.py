@@ -1,5 +1,6 @@
 from rest_framework.permissions import AllowAny
 from rest_framework import generics
+from shared.idempotency import IdempotentCreateMixin
 from .serializers import SponsorApplicationSerializer
 from drf_spectacular.utils import extend_schema, extend_schema_view
 
@@ -14,7 +15,7 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
         Payment methods -> cash, debit_card, bank_transfer  # Naqt, karta, bank orqali
         """
 )
-class SponsorApplicationAPIView(generics.CreateAPIView):
+class SponsorApplicationAPIView(IdempotentCreateMixin, generics.CreateAPIView):
     permission_classes = [AllowAny]
     serializer_class = SponsorApplicationSerializer
 
@@ -12,11 +12,12 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 import django_heroku
 import dj_database_url
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # local apps
     'shared',
@@ -61,7 +63,9 @@ INSTALLED_APPS = [
 ]
 
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework_simplejwt.authentication.JWTAuthentication'],
+    # Trusts the signed staff claims in the access token instead of loading the user on every request.
+    # Views that need the User row itself load it with admin_users.views.CurrentUserMixin.
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication'],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
@@ -72,16 +76,23 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# Written by `manage.py build_schema` at build time and served by shared.views.CachedSpectacularAPIView.
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=10),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=30),
+    "TOKEN_OBTAIN_SERIALIZER": "admin_users.serializers.StaffTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "admin_users.serializers.StaffTokenRefreshSerializer",
 }
 
 MIDDLEWARE = [
+    'shared.middleware.PerformanceMiddleware',  # First, so its wall time covers everything below
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'shared.middleware.ReplicaRoutingMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -127,9 +138,90 @@ if DEBUG:
 
 else:
     DATABASES = {
-        'default': dj_database_url.config(conn_max_age=600)
+        'default': dj_database_url.config(conn_max_age=600, conn_health_checks=True)
     }
 
+# Read replicas of the default database, as comma separated URLs. Reads of the views marked replica_reads go
+# to a random replica (see shared.routers); everything else, and clients that wrote in the last
+# REPLICA_PIN_SECONDS, use the primary. Leave it unset for the test suite: test cases write in transactions the
+# replica connections can not see (shared.tests.ReplicaRoutingTests sets up its own replica).
+DATABASE_REPLICAS = []
+for index, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv())):
+    DATABASES[f'replica{index + 1}'] = {**dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True),
+                                        'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{index + 1}')
+
+DATABASE_ROUTERS = ['shared.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# Connection pooling for PostgreSQL (psycopg 3). Without it every worker thread keeps a persistent connection
+# per database. With DATABASE_POOL=True each worker process shares DATABASE_POOL_SIZE connections per database,
+# opens up to DATABASE_POOL_OVERFLOW more under load (closed after DATABASE_POOL_MAX_IDLE idle seconds), makes
+# requests wait up to DATABASE_POOL_TIMEOUT seconds for a free one and checks each connection before handing it
+# out. The pool is per process: a sync worker serves one request at a time and so never uses more than one
+# connection, the same as without a pool. Fewer server connections than workers takes PgBouncer in front of the
+# database, or threaded workers (gunicorn --threads) sharing their process's pool. Pool statistics are exported
+# by the metrics/ endpoint; `manage.py bench_connections` compares the modes.
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+
+if DATABASE_POOL:
+    DATABASE_POOL_SIZE = config('DATABASE_POOL_SIZE', default=1, cast=int)
+    for database in DATABASES.values():
+        if database['ENGINE'] != 'django.db.backends.postgresql':
+            continue
+        database['CONN_MAX_AGE'] = 0  # Connections go back to the pool after every request
+        database['CONN_HEALTH_CHECKS'] = True  # Makes the pool check connections before handing them out
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DATABASE_POOL_SIZE,
+            'max_size': DATABASE_POOL_SIZE + config('DATABASE_POOL_OVERFLOW', default=8, cast=int),
+            'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=float),
+            'max_idle': config('DATABASE_POOL_MAX_IDLE', default=60, cast=float),
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Shared between workers through Redis when REDIS_URL is set, otherwise local to each process.
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Skip the blacklist query for refresh tokens that were never revoked (see shared.revocation).
+# It needs a cache shared by all workers, so it is on by default only with Redis.
+TOKEN_REVOCATION_FILTER = config('TOKEN_REVOCATION_FILTER', default=bool(REDIS_URL), cast=bool)
+
+# Seconds the analytics totals of closed periods are cached (see admin_dashboard.analytics). Invalidation only
+# reaches every worker through a shared cache; with per-process caches, stale totals expire after this instead.
+ANALYTICS_CACHE_TIMEOUT = None if REDIS_URL else 300
+
+
+# Per-worker request metrics (see shared.metrics), merged by the staff-only metrics/ endpoint.
+# All workers of a machine must share this directory.
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'metsenat-metrics'))
+
+
+# Responses of create requests sent with an Idempotency-Key header (see shared.idempotency).
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)  # Of stored responses
+IDEMPOTENCY_LEASE = timedelta(seconds=60)  # Of a running first request; longer than the gunicorn timeout
+IDEMPOTENCY_MAX_KEYS = config('IDEMPOTENCY_MAX_KEYS', default=100000, cast=int)
+IDEMPOTENCY_WAIT = 2  # Seconds a retry waits for the first request with its key before answering 409
+IDEMPOTENCY_MAX_WAITERS = 4  # Retries per process allowed to wait at once; the others get 409 right away
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
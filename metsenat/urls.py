@@ -16,15 +16,19 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
+
+from shared.views import CachedSpectacularAPIView, MetricsAPIView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('main.urls')),
     path('admin-dashboard/users/', include('admin_users.urls')),
+    path('admin-dashboard/async/', include('admin_dashboard.async_urls')),  # Async read endpoints for ASGI
     path('admin-dashboard/', include('admin_dashboard.urls')),
+    path('metrics/', MetricsAPIView.as_view(), name='metrics'),  # Staff only, Prometheus text format
 
     # Swagger UI
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', CachedSpectacularAPIView.as_view(), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 ]
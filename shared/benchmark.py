@@ -0,0 +1,97 @@
+import math
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connections
+
+from .utils import token
+
+
+class LoadResult:
+    def __init__(self, elapsed, latencies, outcomes):
+        self.elapsed = elapsed
+        self.latencies = latencies  # Seconds per call, in completion order
+        self.outcomes = outcomes  # Counter of whatever the task returned or the exception class name
+
+    @property
+    def count(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'elapsed_s': round(self.elapsed, 3),
+            'throughput_per_s': round(self.throughput, 2),
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 2),
+            'outcomes': dict(self.outcomes),
+        }
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of values; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_concurrently(task, total, concurrency):
+    """
+    Call task(i) for i in range(total) from `concurrency` threads and time every call.
+    Each thread gets its own database connection, which is closed when the thread finishes.
+    """
+    latencies, outcomes = [], Counter()
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    outcome = task(i)
+                except Exception as exc:
+                    outcome = type(exc).__name__
+                latency = time.perf_counter() - started
+                with lock:
+                    latencies.append(latency)
+                    outcomes[outcome] += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return LoadResult(time.perf_counter() - started, latencies, outcomes)
+
+
+def add_username_argument(parser):
+    parser.add_argument('--username', help='Staff user to authenticate as; the first staff user by default.')
+
+
+def staff_auth_headers(username=None):
+    """Authorization header with an access token of the staff user the benchmark requests are sent as."""
+    users = User.objects.filter(is_staff=True, is_active=True)
+    if username:
+        users = users.filter(username=username)
+    user = users.order_by('id').first()
+    if user is None:
+        raise CommandError('No active staff user to authenticate as.')
+    return {'Authorization': f'Bearer {token(user)["access_token"]}'}
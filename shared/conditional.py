@@ -0,0 +1,63 @@
+import hashlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+
+
+def queryset_validators(queryset, *fields):
+    """
+    Return (last_modified, row_count) for queryset in a single aggregate query. last_modified is the latest value
+    of the given datetime fields (e.g. 'updated_at', 'sponsor__updated_at') or None when there are no rows.
+    """
+    aggregates = {f'last_{index}': Max(field) for index, field in enumerate(fields)}
+    values = queryset.order_by().aggregate(row_count=Count('pk'), **aggregates)
+    row_count = values.pop('row_count')
+    last_modified = max((value for value in values.values() if value is not None), default=None)
+    return last_modified, row_count
+
+
+class ConditionalGetMixin:
+    """
+    Serve GET with an ETag and answer a matching If-None-Match with 304 Not Modified before anything is loaded
+    or serialized. The ETag only holds if every write bumps updated_at, including the update() and bulk_update()
+    paths that maintain allocated_total. There is no Last-Modified: deleting a row doesn't move the latest
+    updated_at, only the row count the ETag includes. Views without get_queryset() must override get_validators(),
+    which is checked when they are defined.
+    """
+    validator_fields = ('updated_at',)
+
+    def __init_subclass__(cls, **kwargs):
+        super(ConditionalGetMixin, cls).__init_subclass__(**kwargs)
+        if cls.get_validators is ConditionalGetMixin.get_validators and not hasattr(cls, 'get_queryset'):
+            raise ImproperlyConfigured(f'{cls.__name__} must override get_validators().')
+
+    def get_validators(self):
+        """
+        Return (last_modified, row_count) for what GET would currently return, in one cheap query. By default
+        these are the validator_fields of get_queryset(), narrowed to the looked up object on detail views.
+        Override it where a simpler queryset gives the same answer, e.g. without the annotations of a list.
+        """
+        queryset = self.get_queryset()
+        lookup_url_kwarg = getattr(self, 'lookup_url_kwarg', None) or getattr(self, 'lookup_field', None)
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset_validators(queryset, *self.validator_fields)
+
+    def get_etag(self, last_modified, row_count):
+        state = f'{last_modified.isoformat() if last_modified else ""}:{row_count}:{self.request.accepted_media_type}'
+        return quote_etag(hashlib.md5(state.encode(), usedforsecurity=False).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        last_modified, row_count = self.get_validators()
+        etag = self.get_etag(last_modified, row_count)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
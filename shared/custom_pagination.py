@@ -1,5 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
@@ -18,3 +27,149 @@ class CustomPagination(PageNumberPagination):
                 "result": data
             }
         )
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset() for async views: counts with acount() and reads the page by async iteration."""
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()  # Primes the cached_property so the paginator never counts
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        self.request = request
+        return self.page.object_list
+
+
+class CustomCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first. Every page is a single indexed range scan
+    no matter how deep it is, and no COUNT(*) is run, so the response has links and result but no count.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        if position is None:
+            queryset = queryset.order_by('-created_at', '-id')
+        elif reverse:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+        else:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by('-created_at', '-id')
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.results = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            pk = cursor['i'] if type(cursor['i']) is int else UUID(cursor['i'])  # Integer ids of StudentSponsor
+            position = (datetime.fromisoformat(cursor['c']), pk)
+            return position, bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError, AttributeError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        cursor = {'c': obj.created_at.isoformat(), 'i': str(obj.id) if not isinstance(obj.id, int) else obj.id}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.results:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.results[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "links": {
+                    'previous': self.get_previous_link(),
+                    'next': self.get_next_link()
+                },
+                "result": data
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'links': {
+                    'type': 'object',
+                    'properties': {
+                        'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                        'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                    }
+                },
+                'result': schema,
+            },
+        }
+
+
+class OptionalCursorPaginationMixin:
+    """
+    Lets clients opt into CustomCursorPagination with ?pagination=cursor; page numbers stay the default.
+    Cursor pages are always ordered by (created_at, id), which would throw away the relevance order of a
+    search, so combining the two is rejected with a 400 rather than silently returning unranked results.
+    """
+    cursor_pagination_class = CustomCursorPagination
+    search_query_param = 'search'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            query_params = getattr(self.request, 'query_params', {})
+            if query_params.get('pagination') == 'cursor' or query_params.get('cursor'):
+                if query_params.get(self.search_query_param, '').strip():
+                    raise ValidationError({
+                        'success': False,
+                        'message': 'Search results are ordered by relevance and can not be cursor paginated; '
+                                   'use page numbers.'
+                    })
+                self._paginator = self.cursor_pagination_class()
+        return super(OptionalCursorPaginationMixin, self).paginator
@@ -0,0 +1,184 @@
+import hashlib
+import itertools
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.http.request import RawPostDataException
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import IdempotencyKey
+
+
+POLL_INTERVAL = 0.1  # Seconds between checks on a request that is still running
+PRUNE_EVERY = 100  # Claims per process between prune() runs
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name='Idempotency-Key',
+    type=str,
+    location=OpenApiParameter.HEADER,
+    description="Unique key (e.g. a UUID) of this request. Retries with the same key and body get the response of "
+                "the first request instead of creating again."
+)
+
+_claims = itertools.count(1)
+_waiters = None  # BoundedSemaphore of IDEMPOTENCY_MAX_WAITERS, created on first use
+
+
+def waiter_slots():
+    global _waiters
+    if _waiters is None:
+        _waiters = threading.BoundedSemaphore(settings.IDEMPOTENCY_MAX_WAITERS)
+    return _waiters
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed. Retry later.'
+    default_code = 'idempotency_conflict'
+
+    def __init__(self, record):
+        super(IdempotencyConflict, self).__init__({'success': False, 'message': self.default_detail})
+        # Sent as Retry-After: by then the first request has finished, or its lease has run out.
+        self.wait = max(1, (record.expires_at - timezone.now()).total_seconds())
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used with a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def fingerprint(request):
+    try:
+        body = request.body
+    except RawPostDataException:  # Already parsed
+        body = json.dumps(request.data, sort_keys=True, default=str).encode()
+    return hashlib.sha256(body).hexdigest()
+
+
+def claim(scope, key, request_fingerprint):
+    """
+    Return (record, None) when this request is the first with the key and has to run, or (None, response) with
+    the stored response of the first request. Waits up to IDEMPOTENCY_WAIT seconds while the first one runs.
+
+    A running request holds the key for IDEMPOTENCY_LEASE only, so a first request whose worker was killed
+    (timeout, OOM) blocks its retries until the lease ends rather than for the whole IDEMPOTENCY_KEY_TTL.
+    """
+    if next(_claims) % PRUNE_EVERY == 0:
+        prune()
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+    waiting = False
+    try:
+        while True:
+            try:
+                with transaction.atomic():
+                    return IdempotencyKey.objects.create(
+                        scope=scope, key=key, fingerprint=request_fingerprint,
+                        expires_at=timezone.now() + settings.IDEMPOTENCY_LEASE
+                    ), None
+            except IntegrityError:
+                pass
+
+            record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            if record is None:
+                continue  # The first request failed and released the key
+            if record.expires_at <= timezone.now():
+                # An expired response, or the lease of a request that died; only one retry gets to delete it.
+                IdempotencyKey.objects.filter(id=record.id, expires_at=record.expires_at).delete()
+                continue
+            if record.fingerprint != request_fingerprint:
+                raise IdempotencyKeyReused({'success': False, 'message': IdempotencyKeyReused.default_detail})
+            if record.completed:
+                return None, replay(record)
+            if time.monotonic() >= deadline:
+                raise IdempotencyConflict(record)
+            # Waiting holds a worker, so only a few requests per process may wait at a time.
+            if not waiting and not waiter_slots().acquire(blocking=False):
+                raise IdempotencyConflict(record)
+            waiting = True
+            time.sleep(POLL_INTERVAL)
+    finally:
+        if waiting:
+            waiter_slots().release()
+
+
+def replay(record):
+    response = HttpResponse(bytes(record.response_body), status=record.response_status,
+                            content_type=record.response_content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def prune():
+    """
+    Delete expired keys, then the oldest stored responses beyond the newest IDEMPOTENCY_MAX_KEYS. Keys of requests
+    that are still running are never capped: deleting one would let a retry claim it and write a second time.
+    Returns how many were deleted.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    completed = IdempotencyKey.objects.filter(response_status__isnull=False)
+    cutoff = completed.order_by('-created_at', '-id').values('created_at', 'id')[
+        settings.IDEMPOTENCY_MAX_KEYS:settings.IDEMPOTENCY_MAX_KEYS + 1].first()
+    if cutoff is not None:
+        deleted += completed.filter(
+            Q(created_at__lt=cutoff['created_at']) | Q(created_at=cutoff['created_at'], id__lte=cutoff['id'])
+        ).delete()[0]
+    return deleted
+
+
+class IdempotentCreateMixin:
+    """
+    Idempotency-Key support for POST. The first request with a key runs as usual and its successful response is
+    stored; retries with the same key and body get that response back (with an Idempotent-Replayed header)
+    without validating or writing again, and wait for it while the first request is still running. Failed
+    requests release the key so they can be retried.
+    """
+    idempotency_record = None
+
+    @extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER])
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return super(IdempotentCreateMixin, self).post(request, *args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({'success': False, 'message': 'Idempotency-Key must be 1 to 255 characters.'})
+
+        scope = f'{request.method} {request.path} {request.user.pk or "anonymous"}'
+        record, response = claim(scope, key, fingerprint(request))
+        if response is not None:
+            return response
+
+        self.idempotency_record = record
+        try:
+            return super(IdempotentCreateMixin, self).post(request, *args, **kwargs)
+        except Exception:
+            self.release()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(IdempotentCreateMixin, self).finalize_response(request, response, *args, **kwargs)
+        if self.idempotency_record is None:
+            return response
+        if status.is_success(response.status_code):
+            response.render()
+            IdempotencyKey.objects.filter(id=self.idempotency_record.id).update(
+                response_status=response.status_code, response_content_type=response['Content-Type'],
+                response_body=response.content, expires_at=timezone.now() + settings.IDEMPOTENCY_KEY_TTL
+            )
+            self.idempotency_record = None
+        else:
+            self.release()
+        return response
+
+    def release(self):
+        if self.idempotency_record is not None:
+            IdempotencyKey.objects.filter(id=self.idempotency_record.id).delete()
+            self.idempotency_record = None
@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+
+from shared.benchmark import LoadResult, percentile, run_concurrently
+from shared.metrics import POOL_COUNTERS
+
+
+def measure(alias, total, concurrency, hold):
+    """Run `total` simulated requests from `concurrency` threads of this process; see Command.help."""
+    pool = getattr(connections[alias], 'pool', None)
+    acquire_latencies, opened = [], []
+    lock = threading.Lock()
+
+    def count_connection(sender, connection, **kwargs):
+        if connection.alias == alias:
+            opened.append(1)
+
+    def request(i):
+        close_old_connections()  # As on request_started
+        connection = connections[alias]
+        started = time.perf_counter()
+        connection.ensure_connection()
+        acquired = time.perf_counter() - started
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        time.sleep(hold)
+        close_old_connections()  # As on request_finished: back to the pool, or kept for CONN_MAX_AGE
+        with lock:
+            acquire_latencies.append(acquired)
+        return 'ok'
+
+    if pool is not None:
+        pool.open(wait=True)  # Opens min_size connections, as a worker's pool has long before it gets busy
+    request(-1)  # Warm up
+    connections[alias].close()
+    before = pool.get_stats() if pool is not None else {}
+    connection_created.connect(count_connection)
+    try:
+        result = run_concurrently(request, total, concurrency)
+    finally:
+        connection_created.disconnect(count_connection)
+
+    measured = {'result': result, 'acquire_latencies': acquire_latencies, 'pool': {}}
+    if pool is not None:
+        after = pool.get_stats()
+        measured['server_connections_opened'] = after.get('connections_num', 0) - before.get('connections_num', 0)
+        measured['server_connections_held'] = after['pool_size']
+        measured['pool'] = {key: after.get(key, 0) - before.get(key, 0) for key in POOL_COUNTERS}
+        measured['pool'].update(pool_size=after['pool_size'], pool_max=after['pool_max'])
+    else:
+        measured['server_connections_opened'] = measured['server_connections_held'] = len(opened)
+    return measured
+
+
+def measure_in_process(args):
+    measured = measure(*args)
+    connections.close_all()
+    return measured
+
+
+class Command(BaseCommand):
+    help = ('Simulate requests from many threads that each get a database connection, run a query and hold the '
+            'connection for --hold-ms, with the connection handling Django does around every request. Report '
+            'how long getting the connection took (p50/p95/p99), how many server connections were opened and held '
+            'at the end, and in pool mode (DATABASE_POOL=True), the pool statistics of the run. With --processes, the requests '
+            'are split over that many forked processes, like gunicorn workers, each with --concurrency threads; '
+            'server connections and pool statistics are summed over them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32, help='Threads per process.')
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--hold-ms', type=float, default=5, help='Time each request keeps its connection.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        alias, processes = options['database'], options['processes']
+        args = (alias, options['requests'] // processes, options['concurrency'], options['hold_ms'] / 1000)
+        if processes == 1:
+            runs = [measure(*args)]
+        else:
+            connections.close_all()  # Children must not share the parent's connections
+            with multiprocessing.get_context('fork').Pool(processes) as workers:
+                runs = workers.map(measure_in_process, [args] * processes)
+
+        result = LoadResult(max(run['result'].elapsed for run in runs),
+                            [latency for run in runs for latency in run['result'].latencies],
+                            sum((run['result'].outcomes for run in runs), Counter()))
+        acquire_latencies = [latency for run in runs for latency in run['acquire_latencies']]
+        summary = result.summary()
+        settings_dict = connections[alias].settings_dict
+        summary.update({
+            'mode': 'pool' if settings_dict['OPTIONS'].get('pool') else
+                    'persistent' if settings_dict['CONN_MAX_AGE'] != 0 else 'per-request',
+            'database': connections[alias].vendor,
+            'processes': processes,
+            'concurrency': options['concurrency'],
+            'hold_ms': options['hold_ms'],
+            'acquire_p50_ms': round(percentile(acquire_latencies, 50) * 1000, 3),
+            'acquire_p95_ms': round(percentile(acquire_latencies, 95) * 1000, 3),
+            'acquire_p99_ms': round(percentile(acquire_latencies, 99) * 1000, 3),
+            'acquire_max_ms': round(max(acquire_latencies, default=0) * 1000, 3),
+            'server_connections_opened': sum(run['server_connections_opened'] for run in runs),
+            'server_connections_held': sum(run['server_connections_held'] for run in runs),
+        })
+        if runs[0]['pool']:
+            summary['pool'] = {key: sum(run['pool'][key] for run in runs) for key in runs[0]['pool']}
+        self.stdout.write(json.dumps(summary, indent=2))
@@ -0,0 +1,134 @@
+import json
+import random
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from main.models import Sponsor, Student, StudentSponsor
+from shared.benchmark import add_username_argument, run_concurrently, staff_auth_headers
+
+
+BENCH_PREFIX = 'bench-endpoints'
+ENDPOINTS = ('sponsors/', 'students/', 'students/<id>/sponsors/', 'summary/', 'sponsors/apply')
+
+
+class Command(BaseCommand):
+    help = ('Load the main endpoints through the real URLconf and middleware at a fixed concurrency and write '
+            'throughput and p50/p95/p99 latency per endpoint to a JSON file, optionally compared to an earlier run. '
+            'Fill the database with `manage.py generate_data` first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument('--pages', type=int, default=20, help='List requests spread over this many pages.')
+        parser.add_argument('--seed', type=int, default=0)
+        add_username_argument(parser)
+        parser.add_argument('--url', help='Base URL of a running server; requests go through the test client '
+                                          'in this process otherwise.')
+        parser.add_argument('--label', default='', help='Free text stored with the results, e.g. the change tested.')
+        parser.add_argument('--output', help='Results file; bench-endpoints-<timestamp>.json by default.')
+        parser.add_argument('--compare', help='Results file of an earlier run to compare with.')
+
+    def handle(self, *args, **options):
+        headers = staff_auth_headers(options['username'])
+        send = self.http_sender(options['url'], headers) if options['url'] else self.client_sender(headers)
+
+        rng = random.Random(options['seed'])
+        student_ids = list(StudentSponsor.objects.values_list('student_id', flat=True).distinct()[:1000])
+        results = {}
+        try:
+            for endpoint in options['endpoints']:
+                calls = [self.plan_request(endpoint, rng, options['pages'], student_ids)
+                         for _ in range(options['requests'])]
+                send(*calls[0])  # Warm up
+                result = run_concurrently(lambda i: send(*calls[i]), options['requests'], options['concurrency'])
+                results[endpoint] = result.summary()
+                self.stdout.write(f'{endpoint}: {results[endpoint]["throughput_per_s"]}/s, '
+                                  f'p99 {results[endpoint]["p99_ms"]} ms')
+        finally:
+            Sponsor.objects.filter(full_name__startswith=BENCH_PREFIX).delete()
+
+        run = {
+            'label': options['label'],
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'target': options['url'] or 'in-process',
+            'rows': {model._meta.db_table: model.objects.count() for model in (Sponsor, Student, StudentSponsor)},
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'endpoints': results,
+        }
+        if options['compare']:
+            with open(options['compare']) as file:
+                run['compared_to'] = self.compare(results, json.load(file))
+
+        output = options['output'] or f'{BENCH_PREFIX}-{datetime.now():%Y%m%d-%H%M%S}.json'
+        with open(output, 'w') as file:
+            json.dump(run, file, indent=2)
+        self.stdout.write(json.dumps(run, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+
+    @staticmethod
+    def plan_request(endpoint, rng, pages, student_ids):
+        """(method, path, body) of one request to endpoint."""
+        if endpoint in ('sponsors/', 'students/'):
+            return 'GET', f'/admin-dashboard/{endpoint}?page={rng.randint(1, pages)}', None
+        if endpoint == 'students/<id>/sponsors/':
+            if not student_ids:
+                raise CommandError('No allocations to list; run `manage.py generate_data` first.')
+            return 'GET', f'/admin-dashboard/students/{rng.choice(student_ids)}/sponsors/', None
+        if endpoint == 'summary/':
+            return 'GET', '/admin-dashboard/summary/', None
+        return 'POST', '/sponsors/apply', {
+            'sponsor_type': 'individual', 'full_name': f'{BENCH_PREFIX}-{rng.getrandbits(32)}',
+            'phone_number': f'+99890{rng.randrange(10 ** 7):07d}', 'payment_type': 'cash',
+            'total_sponsorship_amount': 1000000
+        }
+
+    @staticmethod
+    def client_sender(headers):
+        clients = threading.local()  # Test clients keep per-request state, so one per thread
+
+        def send(method, path, body):
+            if not hasattr(clients, 'client'):
+                clients.client = Client(SERVER_NAME='localhost', headers=headers)
+            request = getattr(clients.client, method.lower())
+            if body is None:
+                return request(path).status_code
+            return request(path, json.dumps(body), content_type='application/json').status_code
+        return send
+
+    @staticmethod
+    def http_sender(base_url, headers):
+        def send(method, path, body):
+            data = json.dumps(body).encode() if body is not None else None
+            request = urllib.request.Request(base_url.rstrip('/') + path, data=data, method=method,
+                                             headers={**headers, 'Content-Type': 'application/json'})
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return send
+
+    @staticmethod
+    def compare(results, baseline):
+        """Ratios of this run to the baseline run; above 1 means more throughput or slower p99."""
+        comparison = {'label': baseline.get('label', ''), 'started_at': baseline.get('started_at')}
+        for endpoint, summary in results.items():
+            before = baseline.get('endpoints', {}).get(endpoint)
+            if before:
+                comparison[endpoint] = {
+                    'throughput': round(summary['throughput_per_s'] / before['throughput_per_s'], 2)
+                    if before['throughput_per_s'] else None,
+                    'p99': round(summary['p99_ms'] / before['p99_ms'], 2) if before['p99_ms'] else None,
+                }
+        return comparison
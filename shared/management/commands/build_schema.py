@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from shared.views import CachedSpectacularAPIView
+
+
+class Command(BaseCommand):
+    help = ('Render the OpenAPI schema in every format api/schema/ serves and write it to OPENAPI_SCHEMA_DIR, '
+            'so web processes read it instead of generating it. Run at build time (bin/post_compile on Heroku).')
+
+    def handle(self, *args, **options):
+        Path(settings.OPENAPI_SCHEMA_DIR).mkdir(parents=True, exist_ok=True)
+        view = CachedSpectacularAPIView.as_view(read_prebuilt=False)
+
+        for renderer_format in sorted({renderer.format for renderer in CachedSpectacularAPIView.renderer_classes}):
+            request = RequestFactory().get('/api/schema/', {'format': renderer_format}, SERVER_NAME='localhost')
+            response = view(request)
+            if response.status_code != 200:
+                raise CommandError(f'Rendering the {renderer_format} schema failed with {response.status_code}.')
+            path = CachedSpectacularAPIView.schema_path(renderer_format)
+            path.write_bytes(response.content)
+            self.stdout.write(f'{path} ({len(response.content)} bytes)')
+
+        self.stdout.write(self.style.SUCCESS('OpenAPI schema built.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from shared.idempotency import PRUNE_EVERY, prune
+
+
+class Command(BaseCommand):
+    help = ('Delete expired Idempotency-Key responses and the oldest ones beyond IDEMPOTENCY_MAX_KEYS. Each web '
+            f'process also does this every {PRUNE_EVERY} claimed keys; run it from the scheduler when create traffic '
+            'is low.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f'Deleted {prune()} idempotency key(s).'))
@@ -0,0 +1,244 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connections
+
+
+# Every worker process keeps its own counters and histograms in memory and a background thread writes them, along
+# with the statistics of its database connection pools, to METRICS_DIR/<pid>-<token>.json every FLUSH_INTERVAL
+# seconds while requests come in (and at exit), so requests never wait for the file.
+# The metrics endpoint sums the files of all workers; files of workers that are gone are folded into archive.json
+# so counters never go backwards.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds; +Inf is the count
+# psycopg_pool.ConnectionPool.get_stats() keys exported per database: (key, metric, type, help, scale).
+POOL_STATS = (
+    ('requests_num', 'metsenat_db_pool_checkouts_total', 'counter', 'Connections requested from the pool.', 1),
+    ('requests_queued', 'metsenat_db_pool_waits_total', 'counter',
+     'Checkouts that had to wait for a free connection.', 1),
+    ('requests_wait_ms', 'metsenat_db_pool_wait_seconds_total', 'counter', 'Time checkouts spent waiting.', 0.001),
+    ('requests_errors', 'metsenat_db_pool_checkout_errors_total', 'counter',
+     'Checkouts that failed, e.g. by timing out.', 1),
+    ('returns_bad', 'metsenat_db_pool_bad_returns_total', 'counter', 'Connections returned in a broken state.', 1),
+    ('connections_num', 'metsenat_db_pool_connects_total', 'counter', 'Connections opened to the server.', 1),
+    ('connections_ms', 'metsenat_db_pool_connect_seconds_total', 'counter', 'Time spent opening connections.', 0.001),
+    ('connections_errors', 'metsenat_db_pool_connect_errors_total', 'counter', 'Failed connection attempts.', 1),
+    ('connections_lost', 'metsenat_db_pool_connections_lost_total', 'counter',
+     'Connections the health check found broken.', 1),
+    ('pool_size', 'metsenat_db_pool_connections', 'gauge', 'Open connections, in use or idle.', 1),
+    ('pool_available', 'metsenat_db_pool_idle_connections', 'gauge', 'Idle connections ready to check out.', 1),
+    ('requests_waiting', 'metsenat_db_pool_waiting', 'gauge', 'Checkouts waiting for a connection right now.', 1),
+)
+POOL_KEYS = [key for key, *_ in POOL_STATS]
+POOL_COUNTERS = [key for key, _, kind, *_ in POOL_STATS if kind == 'counter']  # Gauges die with their worker
+FLUSH_INTERVAL = 1.0
+ARCHIVE = 'archive.json'
+
+_lock = threading.Lock()
+_routes = {}
+_dirty = threading.Event()  # Set by observe(), cleared by the flush that writes the new numbers
+_flusher_pid = None  # The process that started the flush thread; a forked worker starts its own
+_token = uuid4().hex[:8]  # A recycled pid must not overwrite the file of the worker that had it before
+
+
+def empty_route():
+    return {'buckets': [0] * len(BUCKETS), 'count': 0, 'seconds': 0.0, 'db_seconds': 0.0, 'db_queries': 0,
+            'serialize_seconds': 0.0, 'render_seconds': 0.0, 'statuses': {}}
+
+
+def observe(view, method, status, seconds, db_seconds, db_queries, serialize_seconds, render_seconds):
+    """Record one request. Cheap enough for every request: a dict update under a lock; the flush thread writes it."""
+    key = f'{view} {method}'
+    if _flusher_pid != os.getpid():
+        start_flusher()
+    with _lock:
+        route = _routes.get(key)
+        if route is None:
+            route = _routes[key] = empty_route()
+        index = bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            route['buckets'][index] += 1
+        route['count'] += 1
+        route['seconds'] += seconds
+        route['db_seconds'] += db_seconds
+        route['db_queries'] += db_queries
+        route['serialize_seconds'] += serialize_seconds
+        route['render_seconds'] += render_seconds
+        route['statuses'][str(status)] = route['statuses'].get(str(status), 0) + 1
+    _dirty.set()
+
+
+def start_flusher():
+    global _flusher_pid
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=flush_periodically, name='metrics-flush', daemon=True).start()
+
+
+def flush_periodically():
+    while True:
+        _dirty.wait()
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass  # E.g. METRICS_DIR is not writable; the numbers stay in memory for the next try
+
+
+def flush():
+    pools = pool_stats()
+    with _lock:
+        _dirty.clear()
+        if not _routes:
+            return
+        snapshot = json.dumps({'routes': _routes, 'pools': pools})
+    write_atomically(metrics_dir() / f'{os.getpid()}-{_token}.json', snapshot)
+
+
+atexit.register(flush)
+
+
+def pool_stats():
+    """Statistics of this process's connection pool per database alias, for the databases that use one."""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)  # Only PostgreSQL has the attribute, None without OPTIONS
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
+
+
+def metrics_dir():
+    path = Path(settings.METRICS_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_atomically(path, content):
+    temporary = path.with_name(f'.{path.name}.{threading.get_ident()}.tmp')
+    temporary.write_text(content)
+    os.replace(temporary, path)
+
+
+def read(path):
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def merge(into, routes):
+    for key, route in routes.items():
+        total = into.setdefault(key, empty_route())
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], route['buckets'])]
+        for field in ('count', 'seconds', 'db_seconds', 'db_queries', 'serialize_seconds', 'render_seconds'):
+            total[field] += route.get(field, 0)  # Files written before serialize_seconds lack it
+        for status, count in route['statuses'].items():
+            total['statuses'][status] = total['statuses'].get(status, 0) + count
+    return into
+
+
+def merge_pools(into, pools, keys):
+    for alias, stats in pools.items():
+        total = into.setdefault(alias, {})
+        for key in keys:
+            total[key] = total.get(key, 0) + stats.get(key, 0)  # get_stats() leaves out counters still at 0
+    return into
+
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """Sum the metrics of every worker, archiving the files of workers that exited."""
+    flush()
+    directory = metrics_dir()
+    with open(directory / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive = read(directory / ARCHIVE)
+        archived = False
+        for path in directory.glob('[0-9]*.json'):
+            if not is_running(int(path.stem.split('-')[0])):
+                worker = read(path)
+                merge(archive.setdefault('routes', {}), worker.get('routes', {}))
+                merge_pools(archive.setdefault('pools', {}), worker.get('pools', {}), POOL_COUNTERS)
+                path.unlink()
+                archived = True
+        if archived:
+            write_atomically(directory / ARCHIVE, json.dumps(archive))
+
+        totals = {'routes': merge({}, archive.get('routes', {})),
+                  'pools': merge_pools({}, archive.get('pools', {}), POOL_COUNTERS)}
+        for path in directory.glob('[0-9]*.json'):
+            worker = read(path)
+            merge(totals['routes'], worker.get('routes', {}))
+            merge_pools(totals['pools'], worker.get('pools', {}), POOL_KEYS)
+    return totals
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in values.items()) + '}'
+
+
+def render_prometheus(totals):
+    """Render collect() output in the Prometheus text exposition format (version 0.0.4)."""
+    routes = totals['routes']
+    lines = [
+        '# HELP metsenat_request_duration_seconds Wall time of requests by view and method.',
+        '# TYPE metsenat_request_duration_seconds histogram',
+    ]
+    parsed = sorted((key.rsplit(' ', 1), route) for key, route in routes.items())
+    for (view, method), route in parsed:
+        cumulative = 0
+        for bound, count in zip(BUCKETS, route['buckets']):
+            cumulative += count
+            lines.append(f'metsenat_request_duration_seconds_bucket{labels(view=view, method=method, le=bound)} '
+                         f'{cumulative}')
+        lines.append(f'metsenat_request_duration_seconds_bucket{labels(view=view, method=method, le="+Inf")} '
+                     f'{route["count"]}')
+        lines.append(f'metsenat_request_duration_seconds_sum{labels(view=view, method=method)} {route["seconds"]}')
+        lines.append(f'metsenat_request_duration_seconds_count{labels(view=view, method=method)} {route["count"]}')
+
+    counters = (
+        ('metsenat_db_duration_seconds_total', 'Time spent in database queries.', 'db_seconds'),
+        ('metsenat_db_queries_total', 'Database queries run.', 'db_queries'),
+        ('metsenat_serialize_duration_seconds_total', 'Time spent building serializer data, less its queries.',
+         'serialize_seconds'),
+        ('metsenat_render_duration_seconds_total', 'Time spent rendering response bodies.', 'render_seconds'),
+    )
+    for name, help_text, field in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{labels(view=view, method=method)} {route[field]}' for (view, method), route in parsed]
+
+    lines += ['# HELP metsenat_responses_total Responses by status code.', '# TYPE metsenat_responses_total counter']
+    for (view, method), route in parsed:
+        for status, count in sorted(route['statuses'].items()):
+            lines.append(f'metsenat_responses_total{labels(view=view, method=method, status=status)} {count}')
+
+    if totals['pools']:
+        for key, name, kind, help_text, scale in POOL_STATS:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{labels(database=alias)} {stats.get(key, 0) * scale}'
+                      for alias, stats in sorted(totals['pools'].items())]
+    return '\n'.join(lines) + '\n'
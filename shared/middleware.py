@@ -0,0 +1,208 @@
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from . import metrics, routers
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() that counts queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class SerializationTimer:
+    """
+    Time spent in to_representation() of shared.serializers.TimedSerializerMixin serializers, i.e. building
+    serializer.data, less the queries run meanwhile, which the QueryRecorder already counts.
+    """
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.seconds = 0.0
+        self.running = False
+
+    @contextmanager
+    def timing(self):
+        if self.running:  # A nested serializer; the outermost one is timed
+            yield
+            return
+        self.running = True
+        started, db_seconds = time.perf_counter(), self.queries.seconds
+        try:
+            yield
+        finally:
+            self.running = False
+            self.seconds += time.perf_counter() - started - (self.queries.seconds - db_seconds)
+
+
+_serialization = ContextVar('serialization_timer', default=None)
+
+
+def serialization_timer():
+    """The SerializationTimer of the current request, or None outside PerformanceMiddleware."""
+    return _serialization.get()
+
+
+def view_name(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'view_class', None)
+    return view_class.__name__ if view_class else match.view_name or match.func.__name__
+
+
+class PerformanceMiddleware:
+    """
+    Times every request: wall time, database queries and their time, serialization (see
+    shared.serializers.TimedSerializerMixin) and rendering of the response body. Sends them back in a
+    Server-Timing header and records them per view in shared.metrics, which shared.views.MetricsAPIView exposes.
+    Keep it first in MIDDLEWARE so the wall time covers the others.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started, recorder = time.perf_counter(), QueryRecorder()
+        timer = SerializationTimer(recorder)
+        with self.recording(recorder, timer):
+            response = self.get_response(request)
+        return self.finish(request, response, started, recorder, timer)
+
+    async def __acall__(self, request):
+        started, recorder = time.perf_counter(), QueryRecorder()
+        timer = SerializationTimer(recorder)
+        with self.recording(recorder, timer):
+            response = await self.get_response(request)
+        return self.finish(request, response, started, recorder, timer)
+
+    @staticmethod
+    def recording(recorder, timer):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        token = _serialization.set(timer)
+        stack.callback(_serialization.reset, token)
+        return stack
+
+    def process_template_response(self, request, response):
+        # Called right before DRF's Response is rendered, so the post-render callback measures the rendering.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def finish(request, response, started, recorder, timer):
+        seconds = time.perf_counter() - started
+        render_seconds = getattr(request, '_render_seconds', 0.0)
+        app_seconds = max(0.0, seconds - recorder.seconds - timer.seconds - render_seconds)
+
+        response['Server-Timing'] = (
+            f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries", '
+            f'serialize;dur={timer.seconds * 1000:.1f}, render;dur={render_seconds * 1000:.1f}, '
+            f'app;dur={app_seconds * 1000:.1f}, total;dur={seconds * 1000:.1f}'
+        )
+        metrics.observe(view_name(request), request.method, response.status_code, seconds,
+                        recorder.seconds, recorder.count, timer.seconds, render_seconds)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets GET and HEAD requests to views with `replica_reads = True` read from a database replica (see
+    shared.routers.ReplicaRouter). A request that writes pins the client's reads to the primary for
+    REPLICA_PIN_SECONDS, which should cover the replicas' lag, so clients read their own writes: by a cookie, and
+    by a cache key per user for API clients that send a Bearer token and don't keep cookies. The user pin reaches
+    every worker only through a shared cache (REDIS_URL).
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'read_primary'
+    pin_key_prefix = 'read_primary:user'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request._routing, token = routers.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        request._routing, token = routers.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        if (settings.DATABASE_REPLICAS and request.method in ('GET', 'HEAD') and getattr(view, 'replica_reads', False)
+                and self.cookie_name not in request.COOKIES and not self.user_is_pinned(request)):
+            request._routing.replica = routers.choose_replica()
+
+    def user_is_pinned(self, request):
+        user_id = self.token_user_id(request)
+        return user_id is not None and cache.get(self.pin_key(user_id)) is not None
+
+    @staticmethod
+    def token_user_id(request):
+        """
+        The id of the user the request's access token is for. DRF only authenticates in the view, after
+        process_view(); the stateless authentication checks the token's signature without a database query.
+        """
+        try:
+            authenticated = JWTStatelessUserAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None  # The view answers 401
+        return authenticated[0].pk if authenticated else None
+
+    def pin_key(self, user_id):
+        return f'{self.pin_key_prefix}:{user_id}'
+
+    def finish(self, request, response):
+        if request._routing.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(self.cookie_name, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+                                samesite='Lax')
+            user_id = self.token_user_id(request)
+            if user_id is not None:
+                cache.set(self.pin_key(user_id), 1, settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2025-03-21 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared', '0001_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='idempotencykey',
+            index=models.Index(fields=['created_at'], name='idempotency_keys_created_idx'),
+        ),
+    ]
@@ -8,4 +8,30 @@ class BaseModel(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        abstract = True  # It means this model is aimed for inheritance and will not be saved in database.
\ No newline at end of file
+        abstract = True  # It means this model is aimed for inheritance and will not be saved in database.
+
+class IdempotencyKey(models.Model):
+    """Response of a create request sent with an Idempotency-Key header, replayed to retries of that request."""
+    scope = models.CharField(max_length=255)  # Method, path and user the key was sent with
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of the request body; a reused key must not change it
+    response_status = models.PositiveSmallIntegerField(null=True)  # None while the first request is running
+    response_content_type = models.CharField(max_length=100, blank=True)
+    response_body = models.BinaryField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # The lease of the running first request until it completes, then when the stored response expires.
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_keys_scope_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_keys_expires_idx'),  # Pruning expired keys
+            models.Index(fields=['created_at'], name='idempotency_keys_created_idx'),  # Capping, oldest first
+        ]
+
+    @property
+    def completed(self):
+        return self.response_status is not None
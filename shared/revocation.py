@@ -0,0 +1,87 @@
+import hashlib
+import math
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+# Every process keeps a Bloom filter of the jtis of blacklisted, unexpired tokens. A miss proves the token is not
+# revoked, so refreshes skip the blacklist query; a hit (revoked or a false positive) falls back to the database.
+# The filter is shared through the cache under a random version that is replaced after every blacklisting commits,
+# which makes each process load (or rebuild) the new filter on its next check. The cache must be shared between
+# workers (REDIS_URL), otherwise a worker could miss another worker's version change.
+
+VERSION_KEY = 'revocation:version'
+FILTER_TIMEOUT = 60 * 60 * 24
+ERROR_RATE = 0.001
+MIN_CAPACITY = 1024
+
+_loaded = (None, None)  # (version, filter) of this process, swapped as one tuple so threads never see a mix
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+
+def is_enabled():
+    return getattr(settings, 'TOKEN_REVOCATION_FILTER', False)
+
+
+def build_filter():
+    jtis = list(BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+                .values_list('token__jti', flat=True))
+    bloom = BloomFilter(max(MIN_CAPACITY, 2 * len(jtis)))
+    for jti in jtis:
+        bloom.add(jti)
+    return bloom
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def load_filter():
+    global _loaded
+    version = current_version()
+    loaded_version, bloom = _loaded
+    if version != loaded_version:
+        # Read the version before the blacklist, so anything blacklisted after the read changes the version again.
+        filter_key = f'revocation:filter:{version}'
+        bloom = cache.get(filter_key)
+        if bloom is None:
+            bloom = build_filter()
+            cache.set(filter_key, bloom, FILTER_TIMEOUT)
+        _loaded = (version, bloom)
+    return bloom
+
+
+def might_be_revoked(jti):
+    """False only if jti is certainly not blacklisted."""
+    return jti in load_filter()
+
+
+def invalidate():
+    """Replace the version so every process reloads the filter. Call once the blacklisting has committed."""
+    cache.set(VERSION_KEY, uuid4().hex, timeout=None)
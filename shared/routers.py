@@ -0,0 +1,63 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+class RoutingState:
+    """How the current request reads: from `replica` until it writes, from the primary after that."""
+
+    def __init__(self):
+        self.replica = None  # Set for the views that read from replicas
+        self.wrote = False
+
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+def start_request():
+    """Start routing the current request; returns its state and the token for end_request()."""
+    state = RoutingState()
+    return state, _routing.set(state)
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+def reads_from_replica(view):
+    """Mark a function view as replica_reads; class-based views set the attribute themselves."""
+    view.replica_reads = True
+    return view
+
+
+def choose_replica():
+    """A random configured replica, or None when there are none."""
+    return random.choice(settings.DATABASE_REPLICAS) if settings.DATABASE_REPLICAS else None
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica shared.middleware.ReplicaRoutingMiddleware picked for the request, and everything
+    else to the primary. Once a request writes, its remaining reads go to the primary too, so it sees its own
+    writes; reads outside requests (commands, shell, tests) always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.wrote or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS  # Replicas get the schema by replication
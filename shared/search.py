@@ -0,0 +1,30 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+
+def fuzzy_search(queryset, search, fields):
+    """
+    Filter queryset to rows where any of fields matches search, best matches first.
+    On PostgreSQL this uses the pg_trgm GIN indexes on those columns: rows are matched by trigram similarity
+    (catching spelling variants) or substring, and ranked by similarity. Other databases fall back to an
+    unindexed case-insensitive substring match. An empty search returns the queryset untouched.
+    """
+    search = (search or '').strip()
+    if not search:
+        return queryset
+
+    matches = Q()
+    for field in fields:
+        matches |= Q(**{f'{field}__icontains': search})
+
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(matches)
+
+    for field in fields:
+        matches |= Q(**{f'{field}__trigram_similar': search})
+    similarities = [TrigramSimilarity(field, search) for field in fields]
+    rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+    return queryset.filter(matches).annotate(search_rank=rank).order_by('-search_rank', *queryset.query.order_by)
@@ -0,0 +1,15 @@
+from .middleware import serialization_timer
+
+
+class TimedSerializerMixin:
+    """
+    Reports the time spent in to_representation() as the `serialize` part of the request's Server-Timing and
+    metrics (see shared.middleware.PerformanceMiddleware). Put it first in the bases of serializers views return.
+    """
+
+    def to_representation(self, instance):
+        timer = serialization_timer()
+        if timer is None:
+            return super(TimedSerializerMixin, self).to_representation(instance)
+        with timer.timing():
+            return super(TimedSerializerMixin, self).to_representation(instance)
@@ -0,0 +1,32 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """
+    Query budget assertions for TestCase classes. assertQueriesIndependentOf() sends the same request against
+    datasets of several sizes, so an N+1 query fails the test however generous the budget is.
+    """
+    dataset_sizes = (1, 3, 10)
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+            if response.streaming:
+                b''.join(response.streaming_content)  # Streamed responses query while they are consumed
+        self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+        return len(queries)
+
+    def assertQueriesIndependentOf(self, seed, request, max_queries):
+        """
+        For every size in dataset_sizes, call seed(count) to add the rows the data is short of that size and then
+        count the queries of request(size). Fails unless every size ran the same number of queries, at most
+        max_queries.
+        """
+        counts, seeded = {}, 0
+        for size in self.dataset_sizes:
+            seed(size - seeded)
+            seeded = size
+            counts[size] = self.count_queries(lambda: request(size))
+        self.assertEqual(len(set(counts.values())), 1, f'Query count grows with the data: {counts}')
+        self.assertLessEqual(counts[size], max_queries, f'Query budget exceeded: {counts}')
@@ -1,3 +1,310 @@
-from django.test import TestCase
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework.serializers import ModelSerializer
+from rest_framework.test import APIClient
+
+from main.models import Sponsor, Student
+from . import idempotency, metrics
+from .models import IdempotencyKey
+from .search import fuzzy_search
+from .utils import token
+from .views import CachedSpectacularAPIView
+
+
+class CachedSchemaTests(TestCase):
+    def setUp(self):
+        CachedSpectacularAPIView._rendered.clear()
+
+    def test_schema_is_generated_once_and_revalidated_by_etag(self):
+        with mock.patch.object(SchemaGenerator, 'get_schema', wraps=SchemaGenerator().get_schema) as get_schema:
+            first = self.client.get('/api/schema/')
+            second = self.client.get('/api/schema/')
+            not_modified = self.client.get('/api/schema/', headers={'if_none_match': first['ETag']})
+
+        self.assertEqual(get_schema.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_each_format_gets_its_own_etag(self):
+        yaml = self.client.get('/api/schema/', {'format': 'yaml'})
+        json = self.client.get('/api/schema/', {'format': 'json'})
+        self.assertTrue(json['Content-Type'].startswith('application/vnd.oai.openapi+json'))
+        self.assertNotEqual(yaml['ETag'], json['ETag'])
+
+    def test_unknown_languages_and_versions_are_not_stored(self):
+        for i in range(3):
+            response = self.client.get('/api/schema/', {'lang': f'xx-{i}', 'version': f'v{i}'})
+            self.assertEqual(response.status_code, 200)
+        self.client.get('/api/schema/', {'lang': 'de'})
+
+        self.assertEqual(set(CachedSpectacularAPIView._rendered), {('yaml', 'de', None)})
+
+
+class PerformanceMetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overridden = override_settings(METRICS_DIR=directory.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        metrics._routes.clear()
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+
+    def test_response_reports_server_timing(self):
+        response = self.client.get('/admin-dashboard/sponsors/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, '
+                                                    r'render;dur=[\d.]+, app;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_serialization_is_timed_where_serializer_data_is_built(self):
+        def slow_representation(serializer, instance):
+            time.sleep(0.01)
+            return {}
+
+        Sponsor.objects.create(sponsor_type='individual', full_name='Sponsor', payment_type='cash',
+                               phone_number='+998901234567', total_sponsorship_amount=1000000)
+        with mock.patch.object(ModelSerializer, 'to_representation', slow_representation):
+            response = self.client.get('/admin-dashboard/sponsors/')
+        serialize = float(re.search(r'serialize;dur=([\d.]+)', response['Server-Timing']).group(1))
+        render = float(re.search(r'render;dur=([\d.]+)', response['Server-Timing']).group(1))
+        self.assertGreaterEqual(serialize, 10)
+        self.assertLess(render, 10)
+
+    def test_metrics_are_written_off_the_request_thread(self):
+        writers = []
+        with mock.patch.object(metrics, 'write_atomically', lambda *args: writers.append(threading.current_thread())):
+            self.client.get('/admin-dashboard/sponsors/')
+        self.assertNotIn(threading.current_thread(), writers)
+        metrics.flush()
+        self.assertTrue(list(Path(settings.METRICS_DIR).glob('[0-9]*.json')))
+
+    def test_metrics_are_recorded_per_view(self):
+        self.client.get('/admin-dashboard/sponsors/')
+        self.client.get('/admin-dashboard/sponsors/')
+
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('metsenat_request_duration_seconds_count{view="SponsorListAPIView",method="GET"} 2', body)
+        self.assertIn('metsenat_responses_total{view="SponsorListAPIView",method="GET",status="200"} 2', body)
+
+    def test_pool_statistics_are_exported(self):
+        stats = {'default': {'requests_num': 10, 'requests_queued': 2, 'requests_wait_ms': 1500, 'pool_size': 4}}
+        with mock.patch.object(metrics, 'pool_stats', return_value=stats):
+            self.client.get('/admin-dashboard/sponsors/')
+            body = self.client.get('/metrics/').content.decode()
+            # Counters of exited workers are kept, their gauges are not.
+            with mock.patch.object(metrics, 'is_running', return_value=False):
+                totals = metrics.collect()
+        self.assertIn('metsenat_db_pool_checkouts_total{database="default"} 10', body)
+        self.assertIn('metsenat_db_pool_wait_seconds_total{database="default"} 1.5', body)
+        self.assertIn('metsenat_db_pool_checkout_errors_total{database="default"} 0', body)
+        self.assertIn('metsenat_db_pool_connections{database="default"} 4', body)
+        self.assertEqual(totals['pools']['default']['requests_num'], 10)
+        self.assertNotIn('pool_size', totals['pools']['default'])
+
+    def test_metrics_require_staff(self):
+        self.client.force_authenticate(User.objects.create_user('user', password='password'))
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='password', is_staff=True))
+        self.data = {'full_name': 'Student', 'phone_number': '+998901234567', 'university': 'TATU',
+                     'degree': 'bachelor', 'tuition_fee': 5000000}
+
+    def create(self, key='key-1', **data):
+        return self.client.post('/admin-dashboard/students/', {**self.data, **data}, format='json',
+                                headers={'Idempotency-Key': key})
+
+    def test_retry_gets_the_stored_response_without_creating_again(self):
+        first = self.create()
+        with self.assertNumQueries(5):  # Failed claim in a savepoint and the lookup of the stored response
+            retry = self.create()
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertEqual(self.create(key='key-2').status_code, 201)
+        self.assertEqual(Student.objects.count(), 2)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.create()
+        self.assertEqual(self.create(full_name='Other').status_code, 422)
+
+    def test_failed_request_releases_the_key(self):
+        self.assertEqual(self.create(tuition_fee='free').status_code, 400)
+        self.assertEqual(self.create().status_code, 201)
+
+    def test_retry_waits_for_the_running_request(self):
+        record = IdempotencyKey.objects.create(scope=f'POST /admin-dashboard/students/ {self.client.handler._force_user.pk}',
+                                               key='key-1', fingerprint='', expires_at=timezone.now() + timedelta(hours=1))
+
+        def finish_first_request(seconds):
+            IdempotencyKey.objects.filter(id=record.id).update(
+                response_status=201, response_content_type='application/json', response_body=b'{"id": 1}')
+
+        with mock.patch.object(idempotency, 'fingerprint', return_value=''), \
+                mock.patch.object(idempotency.time, 'sleep', side_effect=finish_first_request) as sleep:
+            response = self.create()
+        sleep.assert_called_once()
+        self.assertEqual((response.status_code, response.content), (201, b'{"id": 1}'))
+
+        IdempotencyKey.objects.filter(id=record.id).update(response_status=None)
+        with override_settings(IDEMPOTENCY_WAIT=0), mock.patch.object(idempotency, 'fingerprint', return_value=''):
+            response = self.create()
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(0 < int(response['Retry-After']) <= 3600)
+
+    def test_waiting_retries_are_capped(self):
+        self.running_request()
+        with mock.patch.object(idempotency, 'waiter_slots') as waiter_slots, \
+                mock.patch.object(idempotency.time, 'sleep') as sleep:
+            waiter_slots.return_value.acquire.return_value = False
+            self.assertEqual(self.create().status_code, 409)
+        sleep.assert_not_called()
+
+    def test_retry_takes_over_the_lease_of_a_request_that_died(self):
+        record = self.running_request()
+        IdempotencyKey.objects.filter(id=record.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Student.objects.count(), 1)
+        # The stored response is kept for the TTL, not just the lease.
+        self.assertGreater(IdempotencyKey.objects.get().expires_at, timezone.now() + timedelta(hours=23))
+
+    def running_request(self):
+        """A first request holding key-1 that has not finished."""
+        first = self.create()
+        record = IdempotencyKey.objects.get()
+        Student.objects.filter(id=first.data['id']).delete()
+        IdempotencyKey.objects.filter(id=record.id).update(
+            response_status=None, expires_at=timezone.now() + settings.IDEMPOTENCY_LEASE)
+        return record
+
+    @override_settings(IDEMPOTENCY_MAX_KEYS=2)
+    def test_prune_drops_expired_and_oldest_keys(self):
+        now = timezone.now()
+        for i, expires_at in enumerate([now - timedelta(minutes=1)] + [now + timedelta(hours=24)] * 3):
+            IdempotencyKey.objects.create(scope='scope', key=str(i), fingerprint='', expires_at=expires_at,
+                                          response_status=201)
+        # Running, with a lease that ends before every stored response expires; the cap must not touch it.
+        IdempotencyKey.objects.create(scope='scope', key='running', fingerprint='',
+                                      expires_at=now + settings.IDEMPOTENCY_LEASE)
+
+        self.assertEqual(idempotency.prune(), 2)
+        self.assertEqual(sorted(IdempotencyKey.objects.values_list('key', flat=True)), ['2', '3', 'running'])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        students = (('Aziz Karimov', 'TATU'), ('Azizbek Karimov', 'NUUz'), ('Dilnoza Saidova', 'TATU'))
+        for full_name, university in students:
+            Student.objects.create(full_name=full_name, phone_number='+998901234567', university=university,
+                                   degree='bachelor', tuition_fee=5000000)
+
+    def search(self, search):
+        return [student.full_name for student in
+                fuzzy_search(Student.objects.order_by('full_name'), search, ['full_name', 'university'])]
+
+    def test_empty_search_returns_the_queryset_untouched(self):
+        students = Student.objects.order_by('full_name')
+        for search in ('', '   ', None):
+            with self.subTest(search=search):
+                self.assertIs(fuzzy_search(students, search, ['full_name']), students)
+
+    @skipIf(connection.vendor == 'postgresql', 'PostgreSQL matches by trigram similarity instead.')
+    def test_other_databases_match_substrings_in_any_field(self):
+        self.assertEqual(self.search('karimov'), ['Aziz Karimov', 'Azizbek Karimov'])
+        self.assertEqual(self.search('nuu'), ['Azizbek Karimov'])
+        self.assertEqual(self.search('Karimvo'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Ranking needs pg_trgm.')
+    def test_postgresql_ranks_closest_matches_first(self):
+        self.assertEqual(self.search('Aziz Karimov')[:2], ['Aziz Karimov', 'Azizbek Karimov'])
+        self.assertEqual(self.search('Azizbek Karimov')[:2], ['Azizbek Karimov', 'Aziz Karimov'])
+        self.assertEqual(self.search('Dilnoza Saidva'), ['Dilnoza Saidova'])  # Misspelt
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    """Runs against a second SQLite database standing in for a replica that lags behind the primary."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in settings, so the test runner does not try to create a test database for it.
+        cls.replica_file = tempfile.mkstemp(suffix='.sqlite3')[1]
+        connections.settings['replica'] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': cls.replica_file},
+        })['replica']
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(Sponsor)
+        cls.databases = {DEFAULT_DB_ALIAS, 'replica'}
+        super(ReplicaRoutingTests, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ReplicaRoutingTests, cls).tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        os.remove(cls.replica_file)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.staff = User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_authenticate(self.staff)
+        self.sponsor = Sponsor.objects.create(sponsor_type='individual', full_name='Primary', payment_type='cash',
+                                              phone_number='+998901234567', total_sponsorship_amount=1000000)
+        replicated = {field.attname: getattr(self.sponsor, field.attname) for field in Sponsor._meta.concrete_fields}
+        Sponsor.objects.using('replica').bulk_create([Sponsor(**{**replicated, 'full_name': 'Replica'})])
+        self.url = f'/admin-dashboard/sponsors/{self.sponsor.id}'
+
+    def test_marked_views_read_from_the_replica(self):
+        self.assertEqual(self.client.get(self.url).data['full_name'], 'Replica')
+        self.assertEqual(self.client.get('/admin-dashboard/sponsors/').data['result'][0]['full_name'], 'Replica')
+        self.assertEqual(router.db_for_read(Sponsor), DEFAULT_DB_ALIAS)  # Outside requests
+
+    def test_client_reads_its_own_writes(self):
+        response = self.client.patch(self.url, {'full_name': 'Renamed'}, format='json')
+        self.assertEqual(response.data['full_name'], 'Renamed')  # Re-read after the write in the same request
+        self.assertEqual(response.cookies['read_primary']['max-age'], 5)
+        self.assertEqual(Sponsor.objects.using('replica').get().full_name, 'Replica')
+
+        self.assertEqual(self.client.get(self.url).data['full_name'], 'Renamed')
+        del self.client.cookies['read_primary']  # Expired
+        self.assertEqual(self.client.get(self.url).data['full_name'], 'Replica')
+
+    def test_token_clients_without_cookies_read_their_own_writes(self):
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token(self.staff)["access_token"]}')
+        self.client.patch(self.url, {'full_name': 'Renamed'}, format='json')
+        del self.client.cookies['read_primary']
+
+        self.assertEqual(self.client.get(self.url).data['full_name'], 'Renamed')
+        cache.delete(f'read_primary:user:{self.staff.pk}')  # Expired
+        self.assertEqual(self.client.get(self.url).data['full_name'], 'Replica')
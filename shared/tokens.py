@@ -0,0 +1,32 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import revocation
+
+
+# Read back by rest_framework_simplejwt.models.TokenUser, so IsStaffUser and IsSuperUser work without a user query.
+STAFF_CLAIMS = ('is_staff', 'is_superuser')
+
+
+class StaffRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's is_staff and is_superuser flags as signed claims, which its access tokens
+    copy. The flags are re-read from the database on every refresh, so a change reaches new access tokens
+    within ACCESS_TOKEN_LIFETIME.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super(StaffRefreshToken, cls).for_user(user)
+        token.set_staff_claims(user)
+        return token
+
+    def set_staff_claims(self, user):
+        for claim in STAFF_CLAIMS:
+            self[claim] = getattr(user, claim)
+
+    def check_blacklist(self):
+        # The shared revocation filter answers for every token that was never blacklisted without a query.
+        if revocation.is_enabled() and not revocation.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            return
+        super(StaffRefreshToken, self).check_blacklist()
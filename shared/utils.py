@@ -1,9 +1,45 @@
-from rest_framework_simplejwt.tokens import RefreshToken
+import hashlib
+import re
+
+from django.db import connection
+
+from .tokens import StaffRefreshToken
+
+
+COUNTRY_CODE = '998'  # Uzbekistan; numbers without a country code are local
+MONEY_TOLERANCE = 0.01  # Float sums of money may differ in the last digits depending on summation order
 
 
 def token(user):
-    refresh_obj = RefreshToken.for_user(user)
+    refresh_obj = StaffRefreshToken.for_user(user)
     return {
         "access_token": str(refresh_obj.access_token),
         "refresh_token": str(refresh_obj)
     }
+
+
+def normalize_phone_number(phone_number):
+    """
+    Return phone_number as + and digits only ('+998 (90) 123-45-67' and '00998901234567' -> '+998901234567'),
+    or None when it is not a phone number. Local nine digit numbers get the Uzbek country code.
+    """
+    value = re.sub(r'[\s().-]', '', phone_number or '')
+    if value.startswith('00'):
+        value = '+' + value[2:]
+    if re.fullmatch(r'\d{9}', value):
+        value = '+' + COUNTRY_CODE + value
+    elif re.fullmatch(COUNTRY_CODE + r'\d{9}', value):
+        value = '+' + value
+    return value if re.fullmatch(r'\+\d{7,12}', value) else None
+
+
+def advisory_lock(name):
+    """
+    Serialize transactions working on `name` (e.g. one phone number) until the current transaction ends, without
+    locking any table or row. Only PostgreSQL has advisory locks; SQLite serializes all writers anyway.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    key = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big', signed=True)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
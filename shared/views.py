@@ -1,3 +1,89 @@
-from django.shortcuts import render
+import hashlib
+from pathlib import Path
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from .metrics import collect, render_prometheus
+from .permissions import IsStaffUser
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """
+    SpectacularAPIView that renders each format of the schema at most once per process, or reads it from
+    OPENAPI_SCHEMA_DIR when `manage.py build_schema` wrote it at build time, and then serves the stored bytes
+    with a content hash ETag. The schema only changes with the code, i.e. with a deploy and a fresh process.
+    Only configured languages and API versions are stored; others are rendered on every request, so query strings
+    can't grow the cache.
+    """
+    read_prebuilt = True
+    _rendered = {}  # (format, lang, version) -> (content, etag)
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        rendered = self._rendered.get(key) if key is not None else None
+        if rendered is None:
+            content = self.read_schema_file(request) if self.read_prebuilt and key and key[1:] == (None, None) else None
+            if content is None:
+                content = self.render_schema(request, *args, **kwargs)
+            rendered = (content, quote_etag(hashlib.sha256(content).hexdigest()))
+            if key is not None:
+                self._rendered[key] = rendered
+
+        content, etag = rendered
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=self.get_content_type(request))
+            response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, None)}"'
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    @staticmethod
+    def get_cache_key(request):
+        """The key of the schema the request gets, or None when it asks for a language or version we don't serve."""
+        lang, version = request.GET.get('lang') or None, request.GET.get('version')
+        if not settings.USE_I18N:
+            lang = None  # Ignored by SpectacularAPIView
+        elif lang is not None and lang not in dict(settings.LANGUAGES):
+            return None
+        if version is not None and version not in (api_settings.ALLOWED_VERSIONS or ()):
+            return None
+        return request.accepted_renderer.format, lang, version
+
+    @staticmethod
+    def schema_path(renderer_format):
+        return Path(settings.OPENAPI_SCHEMA_DIR) / f'schema.{renderer_format}'
+
+    def read_schema_file(self, request):
+        if settings.DEBUG:
+            return None  # Code changes often during development; always generate
+        try:
+            return self.schema_path(request.accepted_renderer.format).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def render_schema(self, request, *args, **kwargs):
+        response = self.finalize_response(request, super(CachedSpectacularAPIView, self).get(request, *args, **kwargs))
+        return response.render().content
+
+    @staticmethod
+    def get_content_type(request):
+        charset = request.accepted_renderer.charset
+        return f'{request.accepted_media_type}; charset={charset}' if charset else request.accepted_media_type
+
+
+class MetricsAPIView(APIView):
+    """Prometheus metrics of all workers on this machine, as recorded by shared.middleware.PerformanceMiddleware."""
+    permission_classes = [IsAuthenticated, IsStaffUser]
+
+    @extend_schema(tags=['metrics'], responses={(200, 'text/plain'): str})
+    def get(self, request):
+        return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')